@@ -0,0 +1,332 @@
+"""
+============================================================================
+Benchmark of the rollcall hot paths of ta_support_v3
+============================================================================
+
+Generate synthetic rosters shaped like the registrar exports, 9-character
+學號, 姓名 as the Chinese name followed by its romanization, e.g.
+'劉芷妤LIOU,ZHI-YU', and 組別, and time the code paths a rollcall session goes through:
+loading the excel file, selecting a column, looking students up, the
+fuzzy fallback and saving. The results are written as json so they can
+be compared between versions.
+
+## Usage
+
+```sh
+python ta_support_bench.py
+python ta_support_bench.py -s 100 1000 10000 100000 -c 10 100 300 -o bench.json
+```
+
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tempfile
+from typing import Callable
+import numpy as np
+import pandas as pd
+
+import ta_support_v3 as core
+
+SURNAMES = {
+    '陳': 'CHEN', '林': 'LIN', '黃': 'HUANG', '張': 'CHANG', '李': 'LI', '王': 'WANG',
+    '吳': 'WU', '劉': 'LIOU', '蔡': 'TSAI', '楊': 'YANG', '許': 'HSU', '鄭': 'CHENG',
+    '謝': 'HSIEH', '郭': 'KUO', '洪': 'HUNG', '曾': 'TSENG', '邱': 'CHIU', '廖': 'LIAO',
+    '賴': 'LAI', '周': 'CHOU', '徐': 'SHYU', '蘇': 'SU', '葉': 'YEH', '莊': 'CHUANG',
+    '呂': 'LU', '江': 'CHIANG', '何': 'HO', '蕭': 'HSIAO', '羅': 'LO', '高': 'KAO',
+    '潘': 'PAN', '簡': 'CHIEN', '朱': 'CHU', '鍾': 'CHUNG', '彭': 'PENG', '游': 'YU',
+    '詹': 'CHAN', '胡': 'HU', '施': 'SHIH', '沈': 'SHEN', '余': 'YU', '盧': 'LU',
+    '梁': 'LIANG', '趙': 'CHAO', '顏': 'YEN', '柯': 'KO', '翁': 'WENG', '魏': 'WEI',
+    '孫': 'SUN', '戴': 'TAI',
+}
+GIVEN_CHARS = {
+    '家': 'CHIA', '宇': 'YU', '承': 'CHENG', '子': 'TZU', '柏': 'PO', '冠': 'KUAN',
+    '彥': 'YEN', '志': 'CHIH', '俊': 'CHUN', '偉': 'WEI', '怡': 'YI', '婷': 'TING',
+    '欣': 'HSIN', '佳': 'CHIA', '雅': 'YA', '筱': 'HSIAO', '詩': 'SHIH', '庭': 'TING',
+    '瑜': 'YU', '芳': 'FANG', '美': 'MEI', '文': 'WEN', '明': 'MING', '華': 'HUA',
+    '安': 'AN', '傑': 'CHIEH', '強': 'CHIANG', '宏': 'HUNG', '哲': 'CHE', '睿': 'JUI',
+    '翔': 'HSIANG', '凱': 'KAI', '豪': 'HAO', '恩': 'EN', '昕': 'HSIN', '琪': 'CHI',
+    '涵': 'HAN', '萱': 'HSUAN', '妤': 'YU', '晴': 'CHING', '宜': 'YI', '君': 'CHUN',
+}
+FOREIGN_NAMES = ['SMITH,JOHN', 'TANAKA,YUKI', 'NGUYEN,VAN AN', 'KIM,MIN-JUN', 'MULLER,ANNA']
+FOREIGN_RATE = 0.02
+YEARS = [f"{year}" for year in range(103, 113)]
+DEPARTMENTS = ['201', '202', '203', '204', '205', '206', '207', '208', '301', '302', '351', '701', '702', '703']
+SERIALS = 1000
+MARK_WEIGHTS = [0.1, 0.82, 0.08]
+
+
+def synthetic_roster(
+    num_students: int,
+    num_columns: int,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Generate a roster with session columns of marks.
+
+    Args:
+        num_students (int): The number of students.
+        num_columns (int): The number of session columns.
+        seed (int, optional): The random seed.
+
+    Raises:
+        ValueError: If there are not enough distinct 學號 for the students.
+
+    Returns:
+        pd.DataFrame: The roster in the layout of the excel files.
+    """
+    capacity = len(YEARS) * len(DEPARTMENTS) * SERIALS
+    if num_students > capacity:
+        raise ValueError(
+            f"{num_students} students do not fit in the {capacity} synthetic 學號")
+    rng = random.Random(seed)
+    ids = []
+    for k in sorted(rng.sample(range(capacity), num_students)):
+        prefix, serial = divmod(k, SERIALS)
+        year, department = divmod(prefix, len(DEPARTMENTS))
+        ids.append(f"{YEARS[year]}{DEPARTMENTS[department]}{serial:03d}")
+    names = [registrar_name(rng) for _ in range(num_students)]
+    roster = pd.DataFrame({
+        '序號': np.arange(1, num_students + 1),
+        '組別': [f"第{rng.randrange(1, num_students // 6 + 2)}組" for _ in range(num_students)],
+        '系級': [rng.choice(['物理二', '物理三', '化學二', '歷史一']) for _ in range(num_students)],
+        '學號': ids,
+        '姓名': names,
+    })
+    marks = np.random.default_rng(seed).choice(
+        core.MARKS, size=(num_students, num_columns), p=MARK_WEIGHTS)
+    sessions = pd.DataFrame(
+        marks, columns=[f"S{i:03d}" for i in range(num_columns)])
+    return pd.concat([roster, sessions], axis=1)
+
+
+def registrar_name(rng: random.Random) -> str:
+    """Make a 姓名 as the registrar writes it, e.g. '劉芷妤LIOU,ZHI-YU'.
+
+    Args:
+        rng (random.Random): The random generator.
+
+    Returns:
+        str: The name.
+    """
+    if rng.random() < FOREIGN_RATE:
+        return rng.choice(FOREIGN_NAMES)
+    surname = rng.choice(list(SURNAMES))
+    given = rng.choices(list(GIVEN_CHARS), k=rng.choice([1, 2, 2, 2]))
+    return (
+        surname + ''.join(given) +
+        f"{SURNAMES[surname]},{'-'.join(GIVEN_CHARS[c] for c in given)}")
+
+
+def mistype(text: str, rng: random.Random) -> str:
+    """Swap two neighbouring characters or change one digit.
+
+    Args:
+        text (str): The text.
+        rng (random.Random): The random generator.
+
+    Returns:
+        str: The mistyped text.
+    """
+    i = rng.randrange(len(text) - 1)
+    if rng.random() < 0.5:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + str((int(text[i]) + 1) % 10) + text[i + 1:]
+
+
+def timed(func: Callable, repeat: int = 1) -> tuple[float, object]:
+    """Time a call.
+
+    Args:
+        func (Callable): The call without arguments.
+        repeat (int, optional): The number of calls.
+
+    Returns:
+        tuple[float, object]: The mean seconds per call and the last result.
+    """
+    result = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def bench_roster(
+    num_students: int,
+    num_columns: int,
+    workdir: str,
+    queries: int = 200,
+    seed: int = 0,
+) -> list[dict]:
+    """Time the hot paths on one synthetic roster.
+
+    Args:
+        num_students (int): The number of students.
+        num_columns (int): The number of session columns.
+        workdir (str): The directory for the excel file.
+        queries (int, optional): The number of lookups to time.
+        seed (int, optional): The random seed.
+
+    Returns:
+        list[dict]: One result per operation.
+    """
+    rng = random.Random(seed)
+    path = os.path.join(workdir, f"roster_{num_students}_{num_columns}.xlsx")
+    synthetic_roster(num_students, num_columns, seed).to_excel(path, index=False)
+    locations = {'attend': path}
+    results = []
+
+    def record(op: str, seconds: float, **extra):
+        results.append({
+            'students': num_students, 'columns': num_columns,
+            'op': op, 'seconds': seconds, **extra,
+        })
+        print(f"| {num_students:>6} x {num_columns:>3}  {op:<24} {seconds * 1e3:10.3f} ms")
+
+    if os.path.isfile(path + core.CACHE_SUFFIX):
+        os.remove(path + core.CACHE_SUFFIX)
+    seconds, (target, _, _, index) = timed(lambda: core.mode_and_target('attend', locations))
+    record('load_cold', seconds)
+    seconds, (target, _, _, index) = timed(lambda: core.mode_and_target('attend', locations))
+    record('load_warm', seconds)
+    seconds, _ = timed(lambda: core.RosterIndex(target))
+    record('build_index', seconds)
+
+    seconds, _ = timed(lambda: core.check_col(target, 'S000', 'attend'), repeat=5)
+    record('check_col', seconds)
+
+    ids = rng.choices(index.ids, k=queries)
+    chinese = [name for name in core.name_keys(pd.Series(index.names)) if core.CJK_RUN.match(name)]
+    names = [name[:2] for name in rng.choices(chinese, k=queries)]
+    typos = [mistype(student_id, rng) for student_id in ids]
+    id_iter, name_iter = iter(ids * 2), iter(names * 2)
+    seconds, _ = timed(lambda: index.lookup(next(id_iter)), repeat=queries)
+    record('lookup_id', seconds)
+    seconds, _ = timed(lambda: index.lookup(next(name_iter)), repeat=queries)
+    record('lookup_name', seconds)
+    id_iter = iter(ids * 2)
+    seconds, _ = timed(
+        lambda: target[target['學號'].str.contains(next(id_iter))], repeat=min(queries, 20))
+    record('lookup_id_scan', seconds)
+
+    typo_iter = iter(typos * 2)
+    seconds, _ = timed(lambda: index.similar_ids(next(typo_iter)), repeat=min(queries, 50))
+    record('fuzzy_index', seconds)
+    shuffled = [''.join(rng.sample(name, len(name))) for name in rng.choices(chinese, k=queries)]
+    name_iter = iter(shuffled * 2)
+    seconds, _ = timed(lambda: index.similar_names(next(name_iter)), repeat=queries)
+    record('fuzzy_name_grams', seconds)
+    typo_iter = iter(typos * 2)
+    seconds, _ = timed(
+        lambda: core.damerau_levenshtein_distance_np(next(typo_iter), index.ids, 3),
+        repeat=min(queries, 20))
+    record('fuzzy_numpy', seconds)
+
+    def scan(query: str) -> list[int]:
+        return [core.damerau_levenshtein_distance_py(query, x) for x in index.ids]
+
+    typo_iter = iter(typos * 2)
+    seconds, _ = timed(
+        lambda: scan(next(typo_iter)), repeat=max(1, min(5, 20000 // num_students)))
+    record('fuzzy_py_scan', seconds)
+
+    journal = core.CheckinJournal(path, flush_every=0)
+    target = core.prepare_col(target, 'BENCH', 'attend')
+    rows = rng.sample(range(num_students), min(30, num_students))
+
+    def entries():
+        for row in rows:
+            core.set_cell(target, row, 'BENCH', '1')
+            journal.append(index.ids[row], 'BENCH', '1')
+
+    seconds, _ = timed(entries)
+    record('journal_append', seconds / len(rows))
+    seconds, _ = timed(lambda: journal.fold(target))
+    record('save_patch', seconds, changes=len(rows))
+
+    session = core.RollcallSession(target, 'attend', path, journal, index)
+    session.select_columns(['BENCH_SESSION'])
+    marks = [(student_id, rng.choice(core.MARKS)) for student_id in index.ids]
+    seconds, _ = timed(lambda: session.assign_many(marks))
+    record('session_assign_many', seconds / len(marks))
+    journal.close()
+    seconds, _ = timed(lambda: core.export_workbook(target, path))
+    record('save_full', seconds)
+
+    return results
+
+
+def git_revision() -> str:
+    """The git revision of the scripts, '' outside a repository.
+
+    Returns:
+        str: The revision.
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class BenchArgs(argparse.Namespace):
+    """args
+    """
+    students: list[int]
+    columns: list[int]
+    queries: int
+    output: str
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-s", "--students",
+        help="numbers of students",
+        type=int, nargs='+',
+        default=[100, 1000, 10000],
+    )
+    parser.add_argument(
+        "-c", "--columns",
+        help="numbers of session columns",
+        type=int, nargs='+',
+        default=[10, 100],
+    )
+    parser.add_argument(
+        "-q", "--queries",
+        help="number of lookups timed per roster",
+        type=int,
+        default=200,
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="json file of the results",
+        type=str,
+        default='./ta_support_bench.json',
+    )
+    args: BenchArgs = parser.parse_args()
+
+    all_results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for students in args.students:
+            for columns in args.columns:
+                all_results += bench_roster(students, columns, tmp_dir, args.queries)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': git_revision(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'results': all_results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"| Results written to '{args.output}'")
@@ -0,0 +1,622 @@
+"""
+============================================================================
+Rollcall daemon for ta_support_v3
+============================================================================
+
+Keep every workbook in 'ta_support_files.json' loaded in one resident
+process, and let short rollcall sessions connect to it through a Unix
+socket instead of reading the excel files and building the indexes again.
+
+## Usage
+
+```sh
+python ta_support_daemon.py serve               # start the daemon
+python ta_support_daemon.py attend -t 1011      # rollcall through the daemon
+python ta_support_daemon.py group -t g1,g2      # group score through the daemon
+python ta_support_daemon.py flush               # write every workbook now
+python ta_support_daemon.py stop                # write every workbook and stop
+```
+
+Entries are recorded in the check-in journal of each workbook as soon as
+they arrive, and the workbooks are written every '--flush-every' entries,
+every '--save-interval' seconds and when the daemon stops. The workbooks
+are written by a background thread of each workbook, so a TA never waits
+for a save; only 'flush' and 'stop' wait until the files are written. If
+a workbook cannot be written, e.g. while it is open in Excel, the entries stay in
+the journal, are written again with the next ones, and the error is sent
+with the next response.
+
+## Several TAs at once
+
+Several clients can be connected at the same time, e.g. one per door.
+All the writes go through a single writer thread in the daemon, and
+each cell keeps the last write by the time the TA confirmed it. A write
+older than the one already in the cell is dropped, and overwriting a
+different value written by another TA is reported to the client and
+kept in the conflict list.
+
+```sh
+python ta_support_daemon.py attend -t 1011 --name ta-front
+python ta_support_daemon.py attend -t 1011 --name ta-back
+python ta_support_daemon.py conflicts
+```
+
+## Protocol
+
+One json object per line in each direction. A request is
+``{"cmd": ..., ...}`` and a response is ``{"ok": true, ...}`` or
+``{"ok": false, "error": ...}``.
+
+"""
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import getpass
+import argparse
+import threading
+from typing import Optional, Literal
+from colorama import Fore, Style
+import ta_support_prompts as prompts
+
+SOCKET_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'ta_support.sock')
+
+
+class RollcallClient:
+    """Connection to the rollcall daemon.
+
+    The client only needs the standard library, so connecting costs no
+    pandas import.
+
+    Args:
+        socket_path (str, optional): The path of the daemon socket.
+    """
+
+    def __init__(self, socket_path: str = SOCKET_PATH):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._reader = self._sock.makefile('r', encoding='utf-8')
+
+    def request(self, cmd: str, **kwargs) -> dict:
+        """Send one command and wait for the response.
+
+        Args:
+            cmd (str): The command.
+            **kwargs: The arguments of the command.
+
+        Returns:
+            dict: The response.
+        """
+        message = json.dumps({'cmd': cmd, **kwargs}, ensure_ascii=False)
+        self._sock.sendall(message.encode('utf-8') + b'\n')
+        line = self._reader.readline()
+        if len(line) == 0:
+            return {'ok': False, 'error': 'daemon closed the connection'}
+        return json.loads(line)
+
+    def close(self):
+        """Close the connection."""
+        self._reader.close()
+        self._sock.close()
+
+
+class RollcallDaemon:
+    """The state of the daemon: one :class:`ta_support_v3.RollcallSession` per workbook.
+
+    Lookups are answered by the connection threads directly. Everything
+    that changes a workbook is queued to :meth:`writer_loop`, the only
+    thread writing through the sessions, so the clients never wait on
+    each other for a lock. The daemon only adds what several clients
+    need on top of the session: the order of the writes to a cell and
+    the conflicts between them.
+
+    Args:
+        file_locations (dict): The content of 'ta_support_files.json',
+            every workbook of every course is loaded in parallel.
+        flush_every (int, optional): Write a workbook after this many entries.
+        save_interval (float, optional): Write the workbooks with pending
+            entries every this many seconds, 0 to disable.
+    """
+
+    WRITE_COMMANDS = ('columns', 'assign', 'flush', 'stop')
+
+    def __init__(
+        self,
+        file_locations: dict,
+        flush_every: int = 50,
+        save_interval: float = 30.0,
+    ):
+        # pylint: disable=import-outside-toplevel
+        import ta_support_v3 as core
+        self.core = core
+        self.sessions: dict[tuple[str, str], core.RollcallSession] = {}
+        self.save_errors: dict[tuple[str, str], Exception] = {}
+        self.writes: queue.Queue = queue.Queue()
+        self.stopped = threading.Event()
+        self.flush_every = flush_every
+        self.save_interval = save_interval
+        self.cell_stamps: dict[tuple[str, str, int, str], tuple[float, str, object]] = {}
+        self.conflicts: list[dict] = []
+
+        loaded = core.load_workbooks(core.course_locations(file_locations))
+        for (course, mode), (target, target_path, index) in loaded.items():
+            # folded by the daemon, see _fold, and written by the thread of the journal
+            journal = core.CheckinJournal(target_path, flush_every=0, background=True)
+            self.sessions[(course, mode)] = core.RollcallSession(
+                target, mode, target_path, journal, index)
+            print(f"| Loaded '{course}' '{mode}': {len(index)} students from {target_path}")
+        self.courses = sorted({course for course, _ in self.sessions})
+
+    def _key(self, command: dict) -> tuple[str, str]:
+        course = command.get('course')
+        if course is None and len(self.courses) == 1:
+            course = self.courses[0]
+        key = (course, command['mode'])
+        if key not in self.sessions:
+            raise KeyError(f"course '{course}' mode '{command['mode']}' is not loaded")
+        return key
+
+    def _session(self, command: dict):
+        return self.sessions[self._key(command)]
+
+    def _records(self, session, rows: list[int], titles: list[str]) -> list[dict]:
+        cols = list(self.core.RESERVED_COL) + [
+            t for t in titles if t in session.target.columns]
+        return json.loads(session.target.iloc[rows][cols].to_json(
+            orient='records', force_ascii=False))
+
+    def handle(self, command: dict) -> dict:
+        """Run one command, through the writer if it changes a workbook.
+
+        Args:
+            command (dict): The command.
+
+        Returns:
+            dict: The response.
+        """
+        if command.get('cmd') in self.WRITE_COMMANDS:
+            done = threading.Event()
+            slot: dict = {}
+            self.writes.put((command, slot, done))
+            done.wait()
+            response = slot['response']
+            if command['cmd'] == 'flush' and command.get('wait', True):
+                # wait here, not in the writer, so the other clients go on
+                self._wait_saved()
+        else:
+            response = self._run(command)
+        save_errors = self._take_errors()
+        if len(save_errors) > 0:
+            response['save_errors'] = save_errors
+        return response
+
+    def _run(self, command: dict) -> dict:
+        cmd = command.get('cmd')
+        try:
+            if cmd == 'ping':
+                return {'ok': True, 'books': [list(key) for key in sorted(self.sessions)]}
+            if cmd == 'lookup':
+                return self._lookup(command)
+            if cmd == 'conflicts':
+                return {'ok': True, 'conflicts': list(self.conflicts)}
+            if cmd == 'columns':
+                return self._columns(command)
+            if cmd == 'assign':
+                return self._assign(command)
+            if cmd == 'flush':
+                self.flush()
+                return {'ok': True}
+            if cmd == 'stop':
+                self.stopped.set()
+                return {'ok': True}
+            return {'ok': False, 'error': f"unknown command '{cmd}'"}
+        except (KeyError, ValueError) as err:
+            return {'ok': False, 'error': str(err)}
+        except Exception as err:  # pylint: disable=broad-except
+            # e.g. an OSError of the journal, the daemon keeps serving the others
+            return {'ok': False, 'error': f"{type(err).__name__}: {err}"}
+
+    def writer_loop(self):
+        """Apply the queued writes one by one until ``None`` is queued."""
+        while True:
+            item = self.writes.get()
+            if item is None:
+                return
+            command, slot, done = item
+            try:
+                slot['response'] = self._run(command)
+            finally:
+                slot.setdefault('response', {'ok': False, 'error': 'write failed'})
+                done.set()
+
+    def _fold(self, key: tuple[str, str]):
+        try:
+            # only hands a copy of the book to the thread writing the workbook
+            error = self.sessions[key].flush()
+        except Exception as err:  # pylint: disable=broad-except
+            # the entries stay in the journal and are written with the next fold
+            error = err
+        if error is not None:
+            self.save_errors[key] = error
+
+    def _wait_saved(self):
+        for key, session in self.sessions.items():
+            error = session.journal.saver.flush()
+            if error is not None:
+                self.save_errors[key] = error
+
+    def _take_errors(self) -> list[str]:
+        for key, session in self.sessions.items():
+            error = session.take_error()
+            if error is not None:
+                self.save_errors[key] = error
+        errors = []
+        for key in list(self.save_errors):
+            error = self.save_errors.pop(key, None)
+            if error is not None:
+                errors.append(f"Cannot save '{self.sessions[key].target_path}': {error}")
+        return errors
+
+    def _columns(self, command: dict) -> dict:
+        session = self._session(command)
+        missing = [t for t in command['titles'] if t not in session.target.columns]
+        if command.get('create', False):
+            session.select_columns(command['titles'])
+            missing = []
+        return {'ok': True, 'missing': missing}
+
+    def _lookup(self, command: dict) -> dict:
+        session = self._session(command)
+        titles = command.get('titles', [])
+        matched_by, rows = session.lookup(command['query'])
+        if matched_by != '':
+            return {
+                'ok': True, 'matched_by': matched_by,
+                'students': self._records(session, rows, titles),
+            }
+        similar_id, similar_name = session.similar(command['query'])
+        return {
+            'ok': True, 'matched_by': '',
+            'students': self._records(session, similar_id + similar_name, titles),
+        }
+
+    def _assign(self, command: dict) -> dict:
+        course, mode = key = self._key(command)
+        session = self.sessions[key]
+        row = session.row_of(command['id'])
+        stamp = command.get('ts', time.time())
+        client = command.get('client', '')
+        conflicts, written = [], {}
+        for col, value in command['values'].items():
+            value = session.value_of(value)
+            last = self.cell_stamps.get((course, mode, row, col))
+            newer = last is None or stamp >= last[0]
+            if last is not None and last[2] != value and last[1] != client:
+                conflicts.append({
+                    'course': course, 'mode': mode, 'id': command['id'], 'col': col,
+                    'kept': value if newer else last[2],
+                    'kept_by': client if newer else last[1],
+                    'dropped': last[2] if newer else value,
+                    'dropped_by': last[1] if newer else client,
+                })
+            if newer:
+                written[col] = value
+        if len(written) > 0:
+            session.assign(row, list(written.values()), columns=list(written))
+        for col, value in written.items():
+            self.cell_stamps[(course, mode, row, col)] = (stamp, client, value)
+        self.conflicts.extend(conflicts)
+        if session.journal.pending >= self.flush_every:
+            self._fold(key)
+        return {
+            'ok': True,
+            'students': self._records(session, [row], list(command['values'])),
+            'conflicts': conflicts,
+        }
+
+    def flush(self):
+        """Write every workbook with pending entries."""
+        for key, session in self.sessions.items():
+            if session.journal.pending > 0:
+                self._fold(key)
+
+    def save_loop(self):
+        """Queue a flush every ``save_interval`` seconds until stopped."""
+        while not self.stopped.wait(self.save_interval):
+            self.handle({'cmd': 'flush', 'wait': False})
+
+    def close(self) -> list[str]:
+        """Write every workbook and close the journals, once the writer is stopped.
+
+        Returns:
+            list[str]: The workbooks that could not be written, their
+                entries are kept in the journal for the next start.
+        """
+        for key, session in self.sessions.items():
+            self._fold(key)
+            error = session.journal.close()
+            if error is not None:
+                self.save_errors[key] = error
+        return self._take_errors()
+
+
+def serve(
+    socket_path: str = SOCKET_PATH,
+    flush_every: int = 50,
+    save_interval: float = 30.0,
+):
+    """Load every workbook and serve the clients until 'stop'.
+
+    Args:
+        socket_path (str, optional): The path of the daemon socket.
+        flush_every (int, optional): Write a workbook after this many entries.
+        save_interval (float, optional): Write the pending entries every this many seconds.
+    """
+    # pylint: disable=import-outside-toplevel
+    import socketserver
+    import ta_support_v3 as core
+
+    daemon = RollcallDaemon(
+        core.file_location_find(),
+        flush_every=flush_every,
+        save_interval=save_interval,
+    )
+
+    class Handler(socketserver.StreamRequestHandler):
+        """One client connection, one command per line."""
+
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    command = json.loads(line)
+                except json.JSONDecodeError:
+                    response = {'ok': False, 'error': 'invalid json'}
+                else:
+                    response = daemon.handle(command)
+                self.wfile.write(
+                    json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                if daemon.stopped.is_set():
+                    break
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    writer = threading.Thread(target=daemon.writer_loop, daemon=True)
+    writer.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    if save_interval > 0:
+        threading.Thread(target=daemon.save_loop, daemon=True).start()
+    print(Fore.BLUE + Style.BRIGHT + f"| Daemon listening on {socket_path}" + Style.RESET_ALL)
+
+    try:
+        daemon.stopped.wait()
+    except KeyboardInterrupt:
+        daemon.stopped.set()
+    finally:
+        server.shutdown()
+        server.server_close()
+        daemon.writes.put(None)
+        writer.join()
+        for error in daemon.close():
+            print(Fore.RED + Style.BRIGHT + f"| {error}" + Style.RESET_ALL)
+        os.remove(socket_path)
+        print(Fore.BLUE + Style.BRIGHT + "| File exported." + Style.RESET_ALL)
+
+
+def format_students(students: list[dict]) -> str:
+    """The students returned by the daemon, one per line.
+
+    Args:
+        students (list[dict]): The students.
+
+    Returns:
+        str: The lines.
+    """
+    return "\n".join("|   " + "  ".join(str(v) for v in student.values()) for student in students)
+
+
+def show_students(students: list[dict]):
+    """Print the students returned by the daemon.
+
+    Args:
+        students (list[dict]): The students.
+    """
+    if len(students) > 0:
+        print(format_students(students))
+
+
+def show_conflicts(conflicts: list[dict]):
+    """Print the conflicting writes reported by the daemon.
+
+    Args:
+        conflicts (list[dict]): The conflicts.
+    """
+    for c in conflicts:
+        print(
+            Fore.YELLOW + Style.BRIGHT +
+            f"| Conflict on {c['id']} '{c['col']}': kept {c['kept']} by {c['kept_by']}, " +
+            f"dropped {c['dropped']} by {c['dropped_by']}" + Style.RESET_ALL
+        )
+
+
+def show_save_errors(response: dict):
+    """Print the workbooks the daemon could not write.
+
+    Args:
+        response (dict): The response of the daemon.
+    """
+    for error in response.get('save_errors', []):
+        print(
+            Fore.RED + Style.BRIGHT + f"| {error}\n" +
+            "| The entries are kept in the journal and saved again with the next ones." +
+            Style.RESET_ALL)
+
+
+def run_client(
+    client: RollcallClient,
+    mode: Literal['attend', 'test', 'hw', "group"],
+    titles: list[str],
+    name: Optional[str] = None,
+    course: Optional[str] = None,
+):
+    """The rollcall prompt of :func:`ta_support_v3.handle_input`, through the daemon.
+
+    Args:
+        client (RollcallClient): The connection to the daemon.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        titles (list[str]): The columns to be written.
+        name (Optional[str], optional): The name of the TA, reported in the conflicts.
+        course (Optional[str], optional): The course/section, needed if the daemon has several.
+    """
+    if name is None:
+        name = f"{getpass.getuser()}-{os.getpid()}"
+    response = client.request('columns', course=course, mode=mode, titles=titles)
+    if not response['ok']:
+        print(Fore.RED + Style.BRIGHT + f"| {response['error']}" + Style.RESET_ALL)
+        return
+    titles = [t for t in titles if t not in response['missing'] or prompts.ask_new_column(t)]
+    if len(titles) == 0:
+        print(Fore.RED + Style.BRIGHT + "| No title selected." + Style.RESET_ALL)
+        return
+    response = client.request('columns', course=course, mode=mode, titles=titles, create=True)
+    if not response['ok']:
+        print(Fore.RED + Style.BRIGHT + f"| {response['error']}" + Style.RESET_ALL)
+        return
+    hint = prompts.check_hint(mode, titles)
+
+    while True:
+        student = prompts.ask_student(mode, group_commands=False)
+        if student in ['0', 'end']:
+            print('| exit')
+            return
+        if len(student) == 0:
+            continue
+
+        response = client.request(
+            'lookup', course=course, mode=mode, query=student, titles=titles)
+        if response['matched_by'] == '':
+            prompts.print_not_found(student)
+            if len(response['students']) > 0:
+                print("| Similar:")
+                show_students(response['students'])
+            continue
+
+        check = prompts.ask_match(
+            response['matched_by'], student, format_students(response['students']), hint)
+        if check == 'n':
+            continue
+
+        if mode == 'group':
+            scores = prompts.read_scores(check, titles)
+            if scores is None:
+                continue
+            values = dict(zip(titles, scores))
+        elif check in prompts.CHECK_MARKS:
+            values = {titles[0]: prompts.CHECK_MARKS[check]}
+        else:
+            print(Fore.RED+Style.BRIGHT + f'| No assign for {student}'+Style.RESET_ALL)
+            continue
+
+        response = client.request(
+            'assign', course=course, mode=mode, id=response['students'][0]['學號'],
+            values=values, ts=time.time(), client=name)
+        show_save_errors(response)
+        if response['ok']:
+            show_students(response['students'])
+            show_conflicts(response['conflicts'])
+        else:
+            print(Fore.RED + Style.BRIGHT + f"| {response['error']}" + Style.RESET_ALL)
+
+
+class DaemonArgs(argparse.Namespace):
+    """args
+    """
+    command: str
+    title: str
+    flush_every: int
+    save_interval: float
+    socket: str
+    name: Optional[str]
+    course: Optional[str]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "command",
+        help="'serve', 'stop', 'flush', 'conflicts' or a mode: 'attend', 'hw', 'group', 'test'",
+        type=str,
+    )
+    parser.add_argument(
+        "-t", "--title",
+        help="write column title, multiple title divided by ',' in mode 'group'",
+        type=str,
+        default='',
+    )
+    parser.add_argument(
+        "-f", "--flush-every",
+        help="write a workbook every N entries",
+        type=int,
+        default=50,
+    )
+    parser.add_argument(
+        "--save-interval",
+        help="write the workbooks with pending entries every N seconds, 0 to disable",
+        type=float,
+        default=30.0,
+    )
+    parser.add_argument(
+        "--socket",
+        help="path of the daemon socket",
+        type=str,
+        default=SOCKET_PATH,
+    )
+    parser.add_argument(
+        "--name",
+        help="name of the TA reported in the conflicts, default to user and pid",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--course",
+        help="choose the course/section in 'ta_support_files.json'",
+        type=str,
+        default=None,
+    )
+    args: DaemonArgs = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.socket, args.flush_every, args.save_interval)
+        sys.exit()
+
+    try:
+        rollcall_client = RollcallClient(args.socket)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(
+            Fore.RED + Style.BRIGHT +
+            "| Daemon not running. Start it by 'python ta_support_daemon.py serve'." +
+            Style.RESET_ALL
+        )
+        sys.exit(1)
+
+    if args.command in ('stop', 'flush'):
+        print(rollcall_client.request(args.command))
+    elif args.command == 'conflicts':
+        show_conflicts(rollcall_client.request('conflicts')['conflicts'])
+    elif args.command in ('attend', 'hw', 'group', 'test'):
+        if len(args.title) == 0:
+            args.title = input(Fore.BLUE + "| 輸入欲修改的欄位: \n>>> " + Style.RESET_ALL)
+        run_client(
+            rollcall_client,
+            args.command,
+            [t.strip() for t in args.title.split(',') if t.strip()],
+            args.name,
+            args.course,
+        )
+    else:
+        print(Fore.RED + Style.BRIGHT + f"| Unknown command '{args.command}'" + Style.RESET_ALL)
+    rollcall_client.close()
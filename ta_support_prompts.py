@@ -0,0 +1,160 @@
+"""
+============================================================================
+Rollcall prompts shared by ta_support_v3 and ta_support_daemon
+============================================================================
+
+The questions asked to the TA during a rollcall. They only need the
+standard library and colorama, so the client of the daemon asks them
+without importing pandas.
+
+"""
+import re
+from typing import Optional, Literal
+from colorama import Fore, Style
+
+GROUP_PREFIX = 'g:'
+CHECK_MARKS = {'': '1', 'l': '假'}
+
+
+def ask_new_column(col: str) -> bool:
+    """Ask whether to add a column missing from the excel file.
+
+    Args:
+        col (str): The column name.
+
+    Returns:
+        bool: Whether the column is added.
+    """
+    while True:
+        is_add_new_col = input(
+            Fore.YELLOW + Style.BRIGHT +
+            f"| '{col}' not found in excel file. Add it? [y/n]\n" +
+            Style.RESET_ALL+Fore.BLUE+">>> " + Style.RESET_ALL
+        )
+        if is_add_new_col == 'y':
+            return True
+        if is_add_new_col == 'n':
+            print(
+                Fore.YELLOW + Style.BRIGHT +
+                f"| {col} would not be added." + Style.RESET_ALL
+            )
+            return False
+
+
+def check_hint(mode: Literal['attend', 'test', 'hw', "group"], titles: list[str]) -> str:
+    """The hint of the answer confirming a student.
+
+    Args:
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        titles (list[str]): The columns to be written.
+
+    Returns:
+        str: The hint, empty in mode 'test'.
+    """
+    if mode == 'group':
+        return (
+            f"\n| Enter score for '{titles}' or '-1' for be-scored, divided by ','" +
+            "\n| 'n' for no assign. "
+        )
+    if mode in ('hw', 'attend'):
+        return "\n| ENTER to yes, 'n' for no, 'l' for day-off"
+    return ''
+
+
+def ask_student(mode: Literal['attend', 'test', 'hw', "group"], group_commands: bool = True) -> str:
+    """Ask for the next student.
+
+    Args:
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        group_commands (bool, optional): Mention the group commands in mode 'group'.
+
+    Returns:
+        str: The student id or name, or a group command.
+    """
+    return input(
+        Fore.YELLOW +
+        "| Input the student id or name, .\n" +
+        (f"| Input '{GROUP_PREFIX}<group>' to score a whole group, '{GROUP_PREFIX}' to paste a matrix.\n"
+         if mode == 'group' and group_commands else '') +
+        "| Input '0' or 'end' to stop." +
+        Style.RESET_ALL+Fore.BLUE +
+        "\n>>> "+Style.RESET_ALL
+    )
+
+
+def ask_match(matched_by: Literal['id', 'name'], student: str, shown: str, hint: str) -> str:
+    """Ask whether the students found are the one meant.
+
+    Args:
+        matched_by (Literal['id', 'name']): Which column matched.
+        student (str): The query.
+        shown (str): The students found.
+        hint (str): The hint of the answer, see :func:`check_hint`.
+
+    Returns:
+        str: The answer.
+    """
+    what = f"number {student}" if matched_by == 'id' else f"name '{student}'"
+    return input(
+        Fore.YELLOW +
+        f"| Does {what} match: \n{shown}" +
+        Style.RESET_ALL+Fore.BLUE+hint +
+        "\n>>> "+Style.RESET_ALL
+    )
+
+
+def print_not_found(student: str):
+    """Tell that no student matches the query.
+
+    Args:
+        student (str): The query.
+    """
+    print(
+        Fore.RED + Style.BRIGHT +
+        f'| No found any student for following numbers:\n    {student}' +
+        Style.RESET_ALL)
+
+
+def read_scores(
+    check: str,
+    titles: list[str],
+    input_parse: re.Pattern = re.compile('[a-zA-Z0-9_-_.]+'),
+) -> Optional[list[float]]:
+    """Parse the scores typed for a student, telling what is wrong with them.
+
+    Args:
+        check (str): The answer, the scores divided by ','.
+        titles (list[str]): The columns to be written.
+        input_parse (re.Pattern, optional): The pattern of the input.
+
+    Returns:
+        Optional[list[float]]: One score per title, None if the answer is not valid.
+    """
+    scores = check.split(',')
+    scores = [s.strip() for s in scores]
+    scores = [input_parse.findall(s)[0] for s in scores]
+    check_scores = [
+        (k, k.replace(".", "").isnumeric() or k == '-1')
+        for k in scores]
+
+    if len(check_scores) != len(scores):
+        print(
+            Fore.RED + Style.BRIGHT +
+            f'| Some score is not numeric: {check_scores}' +
+            Style.RESET_ALL
+        )
+        return None
+    if len(scores) != len(titles):
+        print(
+            Fore.RED + Style.BRIGHT +
+            f'| The number of score is not match: {check_scores}' +
+            Style.RESET_ALL
+        )
+        return None
+    if not all(k.replace(".", "").isnumeric() or k == '-1' for k in scores):
+        print(
+            Fore.RED + Style.BRIGHT +
+            "| Not all input are numerical. Score not added:\n    " +
+            f"{scores}"+Style.RESET_ALL)
+        return None
+    return [float(s) for s in scores]
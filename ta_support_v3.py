@@ -12,17 +12,148 @@ TA support script for NCCU Course
     - 'attend': attendance
     - 'hw': homework
     - 'group': group score
+    - 'report': statistics of every student and session, written to
+      '<excel file>_report.xlsx'
 4. Input the student id or name.
 5. Input the score, check the attendance and homework.
 6. Input '0' or 'end' to stop.
 
+In a terminal the students matching the id or name are listed as it is
+typed: TAB or UP/DOWN chooses one, ENTER confirms it (and checks it in
+mode 'attend' and 'hw'), '/' confirms it as day-off. '--no-live' asks for
+the whole id or name instead.
+
+In mode 'group', 'g:7' gives the scores to every member of group 7, and
+'g:' reads a pasted group x criteria matrix, one group per line, until an
+empty line.
+
+## Several courses
+
+'ta_support_files.json' may list several courses/sections, each with its
+own files, and '--course' chooses one of them:
+
+```json
+{
+  "112-1-A": {"attend": "./A_出席.xlsx", "hw": "./A_作業.xlsx"},
+  "112-1-B": {"attend": "./B_出席.xlsx", "hw": "./B_作業.xlsx"}
+}
+```
+
+'--check' loads and validates every file of every course in parallel,
+without writing anything, so it is safe next to a running session.
+
+## Importing the roster
+
+```sh
+python ta_support_v3.py --import-roster 112_1.xlsx
+```
+
+makes the excel files of every mode from the registrar export and adds
+them to 'ta_support_files.json'. Every sheet of the export becomes a
+course, and its header row is found by the columns 序號, 系級, 學號 and 姓名.
+
+## Merging copies
+
+```sh
+python ta_support_v3.py -m attend --merge 出席.xlsx 出席_ta1.xlsx 出席_ta2.xlsx
+```
+
+merges copies of a file edited apart, e.g. offline, against the version
+they were copied from, given first. The rows are aligned on 學號, and
+only the columns whose content differs from the base are compared. A
+cell changed to the same value in every copy is merged, otherwise it
+keeps the base value and is listed in '<base>_conflicts.csv'. The
+result is written to '<base>_merged.xlsx'.
+
+## Roster cache
+
+The loaded roster is kept in '<excel file>.cache.pkl' and reused while
+the size and mtime of the excel file stay the same. Editing the excel
+file outside the script makes the next start read it again.
+
+## Bulk ingestion
+
+```sh
+python ta_support_v3.py -m attend -t 1011 --from-file ids.txt
+cat scores.csv | python ta_support_v3.py -m group -t g1,g2 --from-file -
+```
+
+Lines are 'id' (or 'id,l' for day-off) in mode 'attend'/'hw', and
+'id,score,...' in mode 'group'. Rejected lines are written to
+'<excel file>_rejects.csv'.
+
+## SQLite storage
+
+```sh
+python ta_support_v3.py --db -m attend
+python ta_support_v3.py --db --export
+```
+
+With '--db' the books of every course are kept in 'ta_support.sqlite'
+(or the given file), imported from the excel files the first time they
+are opened. Each entry is committed to the database at once, and the
+excel files are only written by '--export'. '--assign-groups' and
+'report' still work on the excel files, so export first.
+
+## Self check-in
+
+```sh
+python ta_support_v3.py -m attend -t 1011 --kiosk
+python ta_support_v3.py -m attend -t 1011 --kiosk web --port 8000
+```
+
+prints the code of the session, to be shown to the class, and lets the
+students check themselves in with their 學號 and the code, at the
+terminal or at a form on 'http://127.0.0.1:8000/'. The code is an HMAC
+of the course and the column, signed with the secret kept in
+'<excel file>.kiosk.key', readable only by its owner, so it stays the
+same if the kiosk is restarted and differs for every session. The check-ins are written to the column
+in batches every 2 seconds. Ctrl-C closes the kiosk.
+
+## Check-in journal
+
+Each entry is appended to '<excel file>.journal' instead of rewriting the
+whole excel file. The journal is folded into the excel file every
+'--flush-every' entries and on exit, and replayed on the next start if
+the script is interrupted. Folding writes only the changed cells and the
+new columns, so the formatting added in Excel is kept.
+
+The excel file is written in the background, so the next prompt never
+waits for it, and the last state is written on exit and on Ctrl-C. If
+the file cannot be written, e.g. while it is open in Excel, the error is
+shown at the next prompt and the entries stay in the journal.
+
+## Library
+
+The prompts are a front end of 'RollcallSession', which scripts and
+other front ends can drive directly:
+
+```python
+from ta_support_v3 import RollcallSession
+
+session = RollcallSession.open('attend', {'attend': './出席.xlsx'})
+session.select_columns(['1011'])
+matched_by, rows = session.lookup('110201001')
+session.assign(rows[0], '1')
+session.assign_many([('110201002', '1'), ('110201003', '假')])
+session.close()
+```
+
+## Profiling
+
+'--profile' times each phase of the entries (lookup, fuzzy, print,
+assign, journal, save), excluding the time waiting for input, prints
+p50/p95/max per phase on exit and writes the samples to
+'ta_support_profile.json' or the given file.
+
 ## Extra Package Required
     
 - colorama
 - pandas
+- openpyxl
     
 ```sh
-pip install colorama pandas
+pip install colorama pandas openpyxl
 ```
 
 """
@@ -30,12 +161,56 @@ import re
 import os
 import sys
 import json
+import time
+import pickle
+import bisect
+import hmac
+import html
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+import unicodedata
+import sqlite3
+import heapq
+import itertools
 import argparse
+import threading
+import http.server
+import urllib.parse
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Optional, Literal, Iterable
+import numpy as np
 import pandas as pd
+import openpyxl
 from colorama import Fore, Style
+from ta_support_prompts import (  # pylint: disable=unused-import
+    GROUP_PREFIX, CHECK_MARKS, ask_new_column, check_hint, ask_student, ask_match,
+    print_not_found, read_scores,
+)
 
 RESERVED_COL = ['組別', '系級', '學號', '姓名']
+DEFAULT_COURSE = 'default'
+MARKS = ['0', '1', '假']
+JOURNAL_SUFFIX = '.journal'
+CACHE_SUFFIX = '.cache.pkl'
+REPORT_CACHE_SUFFIX = '.report.pkl'
+INDEX_CACHE_SUFFIX = '.index.pkl'
+ROSTER_SCHEMA = 1
+INDEX_FORMAT = 2
+# a 學號 read as a number keeps its '.0'
+STUDENT_ID = re.compile(r'[A-Za-z0-9]+(\.0)?')
+CJK_CHARS = '[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]'
+CJK_RUN = re.compile(f"^{CJK_CHARS}+")
+SHEET_ROW = re.compile(rb'<row\b[^>]*?\br="(\d+)"[^>]*>')
+SHEET_CELL = re.compile(rb'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+SHEET_ATTR = re.compile(rb'\b(r|t|s)="([^"]*)"')
+SHEET_TEXT = re.compile(rb'<t\b[^>]*>(.*?)</t>', re.S)
+SHEET_VALUE = re.compile(rb'<v>(.*?)</v>', re.S)
+SHEET_DIMENSION = re.compile(rb'<dimension ref="(?:[A-Z]+\d+:)?([A-Z]+)(\d+)"/>')
+KIOSK_KEY_SUFFIX = '.kiosk.key'
 
 # pylint: disable=line-too-long
 
@@ -90,11 +265,11 @@ def damerau_levenshtein_distance_py(
         return len(seq1)
 
     first_differing_index = 0
-    while all([
-        first_differing_index < len(seq1) - 1,
-        first_differing_index < len(seq2) - 1,
+    while (
+        first_differing_index < len(seq1) - 1 and
+        first_differing_index < len(seq2) - 1 and
         seq1[first_differing_index] == seq2[first_differing_index]
-    ]):
+    ):
         first_differing_index += 1
 
     seq1 = seq1[first_differing_index:]
@@ -122,17 +297,129 @@ def damerau_levenshtein_distance_py(
     return this_row[len(seq2) - 1]
 
 
+def damerau_levenshtein_distance_np(
+    query: str,
+    candidates: Iterable[str],
+    max_distance: Optional[int] = None,
+) -> np.ndarray:
+    """Calculate the Damerau-Levenshtein distance from one query to many candidates.
+
+    The batched version of :func:`damerau_levenshtein_distance_py`, which
+    remains the reference implementation. The candidates must have the
+    same length, they are scored together as a (candidates x length)
+    matrix of code points, one DP row of the query at a time. The
+    insertions along a row are resolved with a running minimum, so every
+    row is a handful of NumPy operations and no Python loop runs per cell.
+
+    With ``max_distance``, a candidate is dropped as soon as the minimum
+    of its DP row exceeds it, since the minimum of a row never decreases,
+    and the scoring stops once every candidate is dropped. The dropped
+    candidates are reported as ``max_distance + 1``.
+
+    >>> cands = ['110201003', '110201030', '110210003', '210201003']
+    >>> [int(d) for d in damerau_levenshtein_distance_np('110201003', cands)]
+    [0, 1, 1, 1]
+    >>> [int(d) for d in damerau_levenshtein_distance_np('110201003', cands)] == [
+    ...     damerau_levenshtein_distance_py('110201003', c) for c in cands]
+    True
+    >>> [int(d) for d in damerau_levenshtein_distance_np('ab', ['ba', 'cd'], 1)]
+    [1, 2]
+
+    Args:
+        query (str): The query.
+        candidates (Iterable[str]): The candidates, all of the same length.
+        max_distance (Optional[int], optional): Stop scoring a candidate
+            once its distance is sure to exceed this value.
+
+    Returns:
+        np.ndarray: The distance to each candidate.
+    """
+    candidates = np.asarray(list(candidates), dtype=str)
+    num = len(candidates)
+    if num == 0:
+        return np.zeros(0, dtype=np.int64)
+    lengths = np.char.str_len(candidates)
+    width = int(lengths[0])
+    if np.any(lengths != width):
+        raise ValueError("All candidates should have the same length.")
+    cap = np.iinfo(np.int64).max // 2 if max_distance is None else max_distance + 1
+    if len(query) == 0 or width == 0:
+        return np.full(num, min(len(query) + width, cap), dtype=np.int64)
+
+    codes = candidates.astype(f'<U{width}').view(np.int32).reshape(num, width)
+    query_codes = np.array([ord(c) for c in query], dtype=np.int32)
+    cols = np.arange(width + 1, dtype=np.int64)
+
+    result = np.full(num, cap, dtype=np.int64)
+    alive = np.arange(num)
+    two_ago = None
+    one_ago = np.broadcast_to(cols, (num, width + 1)).copy()
+    for x, char in enumerate(query_codes):
+        differ = codes != char
+        this_row = np.empty_like(one_ago)
+        this_row[:, 0] = x + 1
+        this_row[:, 1:] = np.minimum(one_ago[:, 1:] + 1, one_ago[:, :-1] + differ)
+        if x > 0:
+            transposed = (
+                (codes[:, :-1] == char) &
+                (codes[:, 1:] == query_codes[x - 1]) &
+                differ[:, 1:]
+            )
+            this_row[:, 2:] = np.where(
+                transposed,
+                np.minimum(this_row[:, 2:], two_ago[:, :-2] + 1),
+                this_row[:, 2:],
+            )
+        this_row = np.minimum.accumulate(this_row - cols, axis=1) + cols
+
+        if max_distance is not None:
+            keep = this_row.min(axis=1) <= max_distance
+            if not keep.all():
+                alive, codes, this_row = alive[keep], codes[keep], this_row[keep]
+                one_ago = one_ago[keep]
+                if len(alive) == 0:
+                    return result
+        two_ago, one_ago = one_ago, this_row
+
+    result[alive] = np.minimum(one_ago[:, -1], cap)
+    return result
+
+
+def course_locations(
+    file_location: dict,
+) -> dict[str, dict[Literal['attend', 'test', 'hw', 'group'], str]]:
+    """Split the supported files by course.
+
+    'ta_support_files.json' either maps the modes of one course to their
+    files, or maps each course/section name to such a mapping::
+
+        {"112-1-A": {"attend": "...", "hw": "..."}, "112-1-B": {...}}
+
+    A single course is named 'default'.
+
+    Args:
+        file_location (dict): The content of 'ta_support_files.json'.
+
+    Returns:
+        dict[str, dict[Literal['attend', 'test', 'hw', 'group'], str]]:
+            The file location of the supported files of each course.
+    """
+    if len(file_location) > 0 and all(isinstance(v, dict) for v in file_location.values()):
+        return file_location
+    return {DEFAULT_COURSE: file_location}
+
+
 def file_location_find(
     supported_file: str = './ta_support_files.json'
-) -> dict[Literal['attend', 'test', 'hw', 'group'], str]:
+) -> dict:
     """Find the file location of the supported files.
 
     Args:
         supported_file (str, optional): The file location of the supported files.
 
     Returns:
-        dict[Literal['attend', 'test', 'hw', 'group'], str]: 
-            The file location of the supported files.
+        dict: The file location of the supported files,
+            by mode or by course then mode, see :func:`course_locations`.
     """
 
     print("-"*40)
@@ -150,18 +437,19 @@ def file_location_find(
     if os.path.isfile(supported_file):
         with open(supported_file, encoding='utf-8') as f:
             print(f"| Found '{supported_file}'")
-            file_location: dict[
-                Literal['attend', 'test', 'hw', 'group'], str
-            ] = json.load(f)
+            file_location: dict = json.load(f)
     else:
         print(Fore.RED + f"| '{supported_file}' not found" + Style.RESET_ALL)
         file_location = {}
     print("-"*40)
     print(f"| Search excel files in '{supported_file}")
-    for k, v in file_location.items():
-        if os.path.isfile(v):
-            print("| Found file: ", k, v)
-        else:
+    for course, locations in course_locations(file_location).items():
+        if course != DEFAULT_COURSE:
+            print(f"| Course '{course}'")
+        for k, v in locations.items():
+            if os.path.isfile(v):
+                print("| Found file: ", k, v)
+                continue
             print("| File not found: ", k, v)
             print(
                 Fore.RED +
@@ -173,310 +461,3284 @@ def file_location_find(
     return file_location
 
 
-def mode_and_target(
+def blank_column(
+    target: pd.DataFrame,
+    col: str,
     mode: Literal['attend', 'test', 'hw', "group"],
-    file_locations: dict[Literal['attend', 'test', 'hw', "group"], str],
-    reserved_col: Optional[list[str]] = None,
-) -> tuple[pd.DataFrame, Literal['attend', 'test', 'hw', "group"], str]:
-    """Setup the mode and target file.
+) -> pd.DataFrame:
+    """Add an empty column with the default value of the mode.
 
     Args:
-        mode (str): Description
-        file_locations (dict[Literal['attend', 'test', 'hw', "group"], str]): Description
-        reserved_col (Optional[list[str]], optional): Description
+        target (pd.DataFrame): Dataframe of the target file.
+        col (str): The column name to be added.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
 
     Returns:
-        tuple[pd.DataFrame, Literal['attend', 'test', 'hw', "group"], str]: Description
+        pd.DataFrame: The dataframe of the target file.
     """
+    if mode == 'group':
+        target[col] = 0.0
+        target[col] = target[col].astype(float)
+    else:
+        target[col] = pd.Categorical.from_codes(
+            np.zeros(len(target), dtype=np.int8), categories=MARKS)
+    return target
 
-    if reserved_col is None:
-        reserved_col = RESERVED_COL
 
-    target_path: str = ''
-    while all([mode != "hw", mode != "attend", mode != "test", mode != "group"]):
-        mode = input(
-            Fore.BLUE + "| 輸入 'attend' 開始點名 / 'hw' 開始登記作業 / 'group' 開始登記小組互評: " + Style.RESET_ALL)
-        if all([mode != "hw", mode != "attend", mode != "test", mode != "group"]):
-            print(
-                Fore.RED + Style.BRIGHT +
-                'ERROR! Plz check the mode!' + Style.RESET_ALL
-            )
-    if mode == "hw":
-        target_path = file_locations['hw']
-    elif mode == "attend":
-        target_path = file_locations['attend']
-    elif mode == "group":
-        target_path = file_locations['group']
-    else:
-        target_path = file_locations['test']
+def mark_column(values: pd.Series) -> pd.Series:
+    """Store a column of marks as a categorical column.
 
-    target = pd.read_excel(target_path)
+    The marks '0', '1', '假' and any other value found are kept as small
+    integer codes, and only turned back into strings when shown or
+    written to the excel file. A column already categorical is returned
+    as it is.
 
-    return target, mode, target_path
+    Args:
+        values (pd.Series): The column.
+
+    Returns:
+        pd.Series: The categorical column.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    text = values.astype(str)
+    extra = sorted(set(text.unique()) - set(MARKS))
+    return pd.Series(
+        pd.Categorical(text, categories=MARKS + extra),
+        index=values.index, name=values.name,
+    )
 
 
-def check_col(
+def compact_marks(
     target: pd.DataFrame,
-    col: str,
-    mode: Literal['attend', 'test', 'hw', "group"],
-) -> tuple[pd.DataFrame, bool]:
-    """Check the column in the target file.
+    reserved_col: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """Turn every column holding only marks into a categorical column.
 
     Args:
         target (pd.DataFrame): Dataframe of the target file.
-        col (str): The column name to be checked.
-        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
 
     Returns:
-        tuple[pd.DataFrame, bool]:
-            The dataframe of the target file and the flag of whether the column is added.
+        pd.DataFrame: The dataframe of the target file.
     """
+    if reserved_col is None:
+        reserved_col = RESERVED_COL
+    for col in target.columns:
+        if col in reserved_col or isinstance(target[col].dtype, pd.CategoricalDtype):
+            continue
+        if target[col].astype(str).isin(MARKS).all():
+            target[col] = mark_column(target[col])
+    return target
 
-    is_add = False
-    if not col in target.columns:
-        is_add_new_col: Literal['y', 'n'] = ''
-        while is_add_new_col not in ["y", "n"]:
-            is_add_new_col = input(
-                Fore.YELLOW + Style.BRIGHT +
-                f"| '{col}' not found in excel file. Add it? [y/n]\n" +
-                Style.RESET_ALL+Fore.BLUE+">>> " + Style.RESET_ALL
-            )
-            if is_add_new_col == 'y':
-                if mode == 'group':
-                    target[col] = 0.0
-                    target[col] = target[col].astype(float)
-                else:
-                    target[col] = '0'
-                    target[col] = target[col].astype(str)
-                is_add = True
-            elif is_add_new_col == 'n':
-                print(
-                    Fore.YELLOW + Style.BRIGHT +
-                    f"| {col} would not be added." + Style.RESET_ALL
-                )
-                is_add = False
-    else:
-        is_add = True
-        if mode == 'group':
-            target[col] = target[col].astype(float)
-        else:
-            target[col] = target[col].astype(str)
 
-    target['學號'] = target['學號'].astype(str)
-    target['組別'] = target['組別'].astype(str)
-    p = re.compile('[a-zA-Z0-9]+')
-    target['組別'] = target['組別'].apply(lambda x: p.findall(x)[0])
+def set_cell(target: pd.DataFrame, row: int, col: str, value):
+    """Write one cell, adding the value to the categories of a mark column.
 
-    return target, is_add
+    A missing value (None or NaN) clears the cell.
 
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        row (int): The row position.
+        col (str): The column name.
+        value (str | float): The value.
+    """
+    column = target[col]
+    if (isinstance(column.dtype, pd.CategoricalDtype) and not pd.isna(value)
+            and value not in column.cat.categories):
+        target[col] = column.cat.add_categories([value])
+    target.iloc[row, target.columns.get_loc(col)] = value
 
-def handle_input(
-    target: pd.DataFrame,
-    mode: Literal['attend', 'test', 'hw', "group"],
-    target_path: str,
-    reserved_col: Optional[list[str]] = None,
-    title_parse: re.Pattern = re.compile('[a-zA-Z0-9_-_._/]+'),
-    input_parse: re.Pattern = re.compile('[a-zA-Z0-9_-_.]+'),
-):
-    """Handle the input from user.
+
+def set_cells(target: pd.DataFrame, cells: dict[int, object], col: str):
+    """Write many cells of one column at once, see :func:`set_cell`.
 
     Args:
         target (pd.DataFrame): Dataframe of the target file.
-        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
-        target_path (str): The path of the target file.
-        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
-        title_parse (re.Pattern, optional): The pattern of the title.
-        input_parse (re.Pattern, optional): The pattern of the input.
+        cells (dict[int, object]): The value by row position.
+        col (str): The column name.
     """
+    column = target[col]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        new = [
+            v for v in set(cells.values())
+            if not pd.isna(v) and v not in column.cat.categories]
+        if len(new) > 0:
+            target[col] = column.cat.add_categories(new)
+    target.iloc[list(cells), target.columns.get_loc(col)] = list(cells.values())
 
-    if reserved_col is None:
-        reserved_col = RESERVED_COL
-    if not isinstance(title_parse, re.Pattern):
-        raise TypeError(
-            f"'title_parse' should be re.Pattern. not '{type(title_parse)}'.")
-    if not isinstance(input_parse, re.Pattern):
-        raise TypeError(
-            f"'input_parse' should be re.Pattern. not '{type(input_parse)}'.")
 
-    titles = []
-    colunm_not_decide = True
-    while colunm_not_decide:
-        hint_for_group = ' (multiple title divided by \',\')' if mode == 'group' else ''
-        raw_col = input(
-            Fore.BLUE + "| 輸入欲修改的欄位: "+hint_for_group+"\n>>> "+Style.RESET_ALL)
-        if raw_col == '':
-            continue
-        titles_raw = raw_col.split(',')
-        titles_raw = [s.strip() for s in titles_raw]
-        titles_raw = [title_parse.findall(s)[0] for s in titles_raw]
-        print(titles_raw)
+def workbook_signature(target_path: str) -> tuple[str, int, int]:
+    """The key identifying the current version of the excel file.
 
-        if mode == 'group':
-            is_confirmed = input(
-                Fore.YELLOW + f"| Check the following column: \n{titles_raw}\n" +
-                Style.RESET_ALL+Fore.BLUE+"| ENTER to yes, 'n' for no to reset" +
-                "\n>>> "+Style.RESET_ALL)
-            colunm_not_decide = is_confirmed == 'n'
-            if not is_confirmed in ['', 'n']:
-                print(
-                    Fore.RED + Style.BRIGHT +
-                    "| Input error. Reset the title." + Style.RESET_ALL
-                )
-                colunm_not_decide = True
-            if colunm_not_decide:
-                print(Fore.YELLOW + "| Title reset." + Style.RESET_ALL)
-        else:
-            if len(titles_raw) == 1:
-                colunm_not_decide = False
-            else:
-                print(
-                    Fore.RED + Style.BRIGHT +
-                    "| Only mode 'group' allow multiple title." + Style.RESET_ALL
-                )
+    Args:
+        target_path (str): The path of the target file.
 
-        for i, t in enumerate(titles_raw):
-            target, is_add = check_col(target, t, mode)
-            if is_add:
-                titles.append(t)
+    Returns:
+        tuple[str, int, int]: The absolute path, the size and the mtime in ns.
+    """
+    stat = os.stat(target_path)
+    return os.path.abspath(target_path), stat.st_size, stat.st_mtime_ns
 
-        if len(titles) == 0:
-            colunm_not_decide = True
-            print(
-                Fore.RED + Style.BRIGHT +
-                "| No title selected. Reset the title." + Style.RESET_ALL
-            )
 
-    running = True
-    while running:
+def roster_digest(target: pd.DataFrame) -> bytes:
+    """The digest of the 學號 and 姓名 of the roster, in the order of the rows.
 
-        student = input(
-            Fore.YELLOW +
-            "| Input the student id or name, .\n" +
-            "| Input '0' or 'end' to stop." +
-            Style.RESET_ALL+Fore.BLUE +
-            "\n>>> "+Style.RESET_ALL
-        )
-        student_id = ''
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
 
-        exit_sign = student in ['0', 'end']
-        if exit_sign:
-            print('| exit')
-            running = False
-            continue
-        if len(student) == 0:
-            continue
+    Returns:
+        bytes: The digest.
+    """
+    hashed = pd.util.hash_pandas_object(target[['學號', '姓名']].astype(str), index=False)
+    return hashlib.blake2b(hashed.to_numpy().tobytes(), digest_size=16).digest()
 
-        filtered_id = target[target['學號'].str.contains(student)]
-        filtered_name = target[target['姓名'].str.contains(student)]
-        if mode == 'group':
-            chech_hint = (
-                f"\n| Enter score for '{titles}' or '-1' for be-scored, divided by ','" +
-                "\n| 'n' for no assign. "
-            )
-        elif mode in ('hw', 'attend'):
-            chech_hint = "\n| ENTER to yes, 'n' for no, 'l' for day-off"
-        else:
-            chech_hint = ''
 
-        if len(filtered_id) > 0:
-            check = input(
-                Fore.YELLOW +
-                f"| Does number {student} match: \n{filtered_id}" +
-                Style.RESET_ALL+Fore.BLUE+chech_hint +
-                "\n>>> "+Style.RESET_ALL
-            )
-            student_id = filtered_id["學號"].iloc[0]
-        elif len(filtered_name) > 0:
-            check = input(
-                Fore.YELLOW +
-                f"| Does name '{student}' match: \n{filtered_name}" +
-                Style.RESET_ALL+Fore.BLUE +
-                Style.RESET_ALL+Fore.BLUE+chech_hint +
-                "\n>>> "+Style.RESET_ALL
-            )
-            student_id = filtered_name["學號"].iloc[0]
-        else:
-            print(
-                Fore.RED + Style.BRIGHT +
-                f'| No found any student for following numbers:\n    {student}' +
-                Style.RESET_ALL)
-            similar_id = target['學號'].astype(str).apply(
-                lambda x: damerau_levenshtein_distance_py(student, x) <= 3
-            )
-            similar_name = target['姓名'].astype(str).apply(
-                lambda x: damerau_levenshtein_distance_py(student, x) <= 2
-            )
-            if len(similar_id) > 0:
-                print("| Similar id:\n", target[similar_id])
-            if len(similar_name) > 0:
-                print("| Similar name:\n", target[similar_name])
-            continue
+def load_roster_index(target: pd.DataFrame, target_path: str) -> 'RosterIndex':
+    """The roster index, from the sidecar '<excel file>.index.pkl' if still valid.
 
-        if check == 'n':
-            continue
+    The index only depends on the 學號 and 姓名, so the cache is keyed on
+    their digest rather than on the excel file, and saving the marks
+    does not invalidate it. :data:`INDEX_FORMAT` is stored with the
+    digest, so an index pickled by an older :class:`RosterIndex` is
+    rebuilt rather than used with missing attributes.
 
-        if mode == 'group':
-            scores = check.split(',')
-            scores = [s.strip() for s in scores]
-            scores = [input_parse.findall(s)[0] for s in scores]
-            check_scores = [
-                (k, k.replace(".", "").isnumeric() or k == '-1')
-                for k in scores]
-
-            if len(check_scores) != len(scores):
-                print(
-                    Fore.RED + Style.BRIGHT +
-                    f'| Some score is not numeric: {check_scores}' +
-                    Style.RESET_ALL
-                )
-                continue
-            if len(scores) != len(titles):
-                print(
-                    Fore.RED + Style.BRIGHT +
-                    f'| The number of score is not match: {check_scores}' +
-                    Style.RESET_ALL
-                )
-                continue
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        target_path (str): The path of the target file.
 
-            if all(k.replace(".", "").isnumeric() or k == '-1' for k in scores):
-                for i, s in enumerate(scores):
-                    target.loc[(target['學號'] == student_id),
-                               titles[i]] = float(s)
-                print("| Score added.")
-                print(target[(target['學號'] == student_id)][
-                    list(reserved_col)+titles])
-                continue
+    Returns:
+        RosterIndex: The index.
+    """
+    cache_path = target_path + INDEX_CACHE_SUFFIX
+    digest = roster_digest(target)
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached['digest'] == digest and cached.get('format') == INDEX_FORMAT:
+                return cached['index']
+        except Exception:  # pylint: disable=broad-except
+            # unreadable or from another version, rebuild it below
+            pass
+
+    index = RosterIndex(target)
+    tmp_path = cache_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(
+                {'digest': digest, 'format': INDEX_FORMAT, 'index': index},
+                f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return index
+
+
+def write_roster_cache(target: pd.DataFrame, target_path: str):
+    """Store the dataframe in the sidecar cache of the excel file.
 
-            print(
-                Fore.RED + Style.BRIGHT +
-                "| Not all input are numerical. Score not added:\n    " +
-                f"{scores}"+Style.RESET_ALL)
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        target_path (str): The path of the target file.
+    """
+    cache_path = target_path + CACHE_SUFFIX
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(
+            {'signature': workbook_signature(target_path), 'frame': target},
+            f, protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    os.replace(tmp_path, cache_path)
 
-        else:
-            if len(check) == 0:
-                target.loc[(target['學號'] == student_id), titles[0]] = "1"
-            elif check == 'l':
-                target.loc[(target['學號'] == student_id), titles[0]] = "假"
-            else:
-                print(Fore.RED+Style.BRIGHT +
-                      f'| No assign for {student}'+Style.RESET_ALL)
-            print(target[target['學號'] == student_id][
-                list(reserved_col)+titles])
 
-        target.to_excel(target_path, index=False)
+def read_workbook(target_path: str, use_cache: bool = True) -> pd.DataFrame:
+    """Read the excel file, through the sidecar cache if it is still valid.
 
+    The cache '<excel file>.cache.pkl' is keyed on the path, size and mtime
+    of the excel file, so it is rebuilt whenever the file is changed
+    outside the script.
 
-class MyProgramArgs(argparse.Namespace):
-    """args
+    Args:
+        target_path (str): The path of the target file.
+        use_cache (bool, optional): Read and write the sidecar cache.
+
+    Returns:
+        pd.DataFrame: Dataframe of the target file.
     """
-    mode: Optional[Literal['attend', 'test', 'hw', "group"]]
-    title: Optional[str]
-    check: bool
+    if not use_cache:
+        return pd.read_excel(target_path)
+    cache_path = target_path + CACHE_SUFFIX
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached['signature'] == workbook_signature(target_path):
+                return cached['frame']
+        except Exception:  # pylint: disable=broad-except
+            # unreadable or from another pandas version, rebuild it below
+            pass
 
+    target = pd.read_excel(target_path)
+    write_roster_cache(target, target_path)
+    return target
 
-if __name__ == '__main__':
-    fileLocations = file_location_find()
-    # if len(fileLocations) == 0:
+
+def export_workbook(target: pd.DataFrame, target_path: str):
+    """Write the dataframe to the excel file.
+
+    The workbook is written to a temporary file next to it and then
+    renamed over the original, so a crash during the export never leaves
+    a half-written workbook behind. The sidecar cache is refreshed, so
+    the next start does not parse the excel file again.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        target_path (str): The path of the target file.
+    """
+    root, ext = os.path.splitext(target_path)
+    tmp_path = f"{root}.tmp{ext}"
+    target.to_excel(tmp_path, index=False)
+    os.replace(tmp_path, target_path)
+    write_roster_cache(target, target_path)
+
+
+def sheet_entry(archive: zipfile.ZipFile) -> str:
+    """The name of the xml of the first sheet in the xlsx archive.
+
+    Args:
+        archive (zipfile.ZipFile): The xlsx file.
+
+    Raises:
+        ValueError: If the workbook has no sheet.
+
+    Returns:
+        str: The name in the archive, e.g. 'xl/worksheets/sheet1.xml'.
+    """
+    rel_id = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    sheet = next(iter(workbook.iter(
+        '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}sheet')), None)
+    if sheet is None:
+        raise ValueError("The workbook has no sheet.")
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels:
+        if rel.get('Id') == sheet.get(rel_id):
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else 'xl/' + target
+    raise ValueError("The first sheet is not in the workbook.")
+
+
+def sheet_cell_value(attrs: dict[bytes, bytes], body: Optional[bytes], shared: list[str]):
+    """The value of a cell of the sheet xml, as openpyxl would read it.
+
+    Args:
+        attrs (dict[bytes, bytes]): The attributes 'r', 't' and 's' of the cell.
+        body (Optional[bytes]): The content of the cell.
+        shared (list[str]): The shared strings of the workbook.
+
+    Returns:
+        str | int | float | None: The value.
+    """
+    if body is None:
+        return None
+    kind = attrs.get(b't', b'n')
+    if kind == b'inlineStr':
+        return html.unescape(b''.join(SHEET_TEXT.findall(body)).decode('utf-8'))
+    value = SHEET_VALUE.search(body)
+    if value is None:
+        return None
+    text = html.unescape(value.group(1).decode('utf-8'))
+    if kind == b's':
+        return shared[int(text)]
+    if kind in (b'str', b'e', b'b'):
+        return text
+    number = float(text)
+    return int(number) if number.is_integer() else number
+
+
+def sheet_cell_xml(ref: str, style: Optional[bytes], value) -> bytes:
+    """A cell of the sheet xml, strings are written inline.
+
+    Args:
+        ref (str): The reference of the cell, e.g. 'F12'.
+        style (Optional[bytes]): The style of the cell, kept from the old cell.
+        value: The value, None for an empty cell.
+
+    Returns:
+        bytes: The xml of the cell.
+    """
+    value = plain_value(value)
+    head = f'<c r="{ref}"' + ('' if style is None else f' s="{style.decode()}"')
+    if value is None:
+        return (head + '/>').encode('utf-8')
+    if isinstance(value, bool):
+        return (head + f' t="b"><v>{int(value)}</v></c>').encode('utf-8')
+    if isinstance(value, (int, float)):
+        return (head + f'><v>{value!r}</v></c>').encode('utf-8')
+    text = escape(str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return (head + f' t="inlineStr"><is><t{space}>{text}</t></is></c>').encode('utf-8')
+
+
+def patch_workbook(
+    target: pd.DataFrame,
+    target_path: str,
+    changes: dict[tuple[str, str], object],
+):
+    """Write only the changed cells into the existing excel file.
+
+    The cells are located by the 學號 column and the header row of the
+    first sheet, and the columns of the dataframe missing from the sheet
+    are appended with their values. Only the rows holding a change are
+    rewritten in the xml of the sheet, and every other part of the xlsx
+    archive is copied as it is, so the formatting added in Excel is kept
+    and the cost is a scan of the sheet rather than a parse of every cell.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        target_path (str): The path of the target file.
+        changes (dict[tuple[str, str], object]): The value by (student id, column).
+
+    Raises:
+        KeyError: If a student or the 學號 column is not in the sheet.
+        ValueError: If the sheet does not have the rows of the dataframe,
+            or its xml is not laid out as Excel and openpyxl write it.
+    """
+    with zipfile.ZipFile(target_path) as archive:
+        sheet_name = sheet_entry(archive)
+        sheet = archive.read(sheet_name)
+        shared = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            ns = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+            # the text of a string is in <t>, or in the <t> of its runs <r>, not in <rPh>
+            shared = [
+                ''.join(t.text or '' for t in si.findall(f'{ns}t') + si.findall(f'{ns}r/{ns}t'))
+                for si in ET.fromstring(archive.read('xl/sharedStrings.xml')).iter(f'{ns}si')]
+        entries = [(info, None if info.filename == sheet_name else archive.read(info.filename))
+                   for info in archive.infolist()]
+
+    # a row runs from its tag to the tag of the next row, or to the end of the sheet data
+    starts = [(int(m.group(1)), m.start()) for m in SHEET_ROW.finditer(sheet)]
+    data_end = sheet.find(b'</sheetData>')
+    if 1 not in dict(starts) or data_end < 0:
+        raise ValueError("The sheet has no header row.")
+    ends = [start for _, start in starts[1:]] + [data_end]
+    rows = {number: (start, end) for (number, start), end in zip(starts, ends)}
+
+    def cells_of(row_xml: bytes) -> dict[int, tuple[dict[bytes, bytes], Optional[bytes], bytes]]:
+        cells = {}
+        for cell in SHEET_CELL.finditer(row_xml, row_xml.index(b'>') + 1):
+            attrs = dict(SHEET_ATTR.findall(cell.group(1)))
+            if b'r' not in attrs:
+                raise ValueError("A cell of the sheet has no reference.")
+            letters = attrs[b'r'].rstrip(b'0123456789').decode()
+            cells[openpyxl.utils.column_index_from_string(letters)] = (
+                attrs, cell.group(2), cell.group(0))
+        return cells
+
+    header = {
+        sheet_cell_value(attrs, body, shared): column
+        for column, (attrs, body, _) in cells_of(sheet[slice(*rows[1])]).items()}
+    header.pop(None, None)
+    if '學號' not in header:
+        raise KeyError("'學號' not found in the sheet.")
+
+    id_ref = re.compile(
+        rb'<c\b[^>]*?\br="' + openpyxl.utils.get_column_letter(header['學號']).encode() +
+        rb'\d+"[^>]*?(?:/>|>(.*?)</c>)', re.S)
+    row_of: dict[str, int] = {}
+    for number, (start, end) in rows.items():
+        if number == 1:
+            continue
+        cell = id_ref.search(sheet, start, end)
+        if cell is None:
+            continue
+        attrs = dict(SHEET_ATTR.findall(cell.group(0)[:cell.group(0).index(b'>')]))
+        row_of.setdefault(str(sheet_cell_value(attrs, cell.group(1), shared)), number)
+
+    edits: dict[int, dict[int, object]] = {}
+    dimension = SHEET_DIMENSION.search(sheet)
+    last_column = max(header.values())
+    if dimension is not None:
+        last_column = max(last_column, openpyxl.utils.column_index_from_string(
+            dimension.group(1).decode()))
+    for col in target.columns:
+        if col in header:
+            continue
+        if len(row_of) != len(target):
+            raise ValueError("The sheet does not match the dataframe.")
+        last_column += 1
+        header[col] = last_column
+        edits.setdefault(1, {})[last_column] = col
+        for student_id, value in zip(target['學號'].astype(str), target[col].tolist()):
+            edits.setdefault(row_of[student_id], {})[last_column] = value
+    for (student_id, col), value in changes.items():
+        edits.setdefault(row_of[student_id], {})[header[col]] = value
+
+    parts, position = [], 0
+    for number in sorted(edits):
+        start, end = rows[number]
+        row_xml = sheet[start:end]
+        cells = cells_of(row_xml)
+        for column, value in edits[number].items():
+            ref = f"{openpyxl.utils.get_column_letter(column)}{number}"
+            style = cells[column][0].get(b's') if column in cells else None
+            cells[column] = (None, None, sheet_cell_xml(ref, style, value))
+        opening = row_xml[:row_xml.index(b'>') + 1]
+        if opening.endswith(b'/>'):
+            opening = opening[:-2] + b'>'
+        opening = re.sub(rb'\sspans="[^"]*"', b'', opening)
+        parts += [sheet[position:start], opening,
+                  b''.join(cells[column][2] for column in sorted(cells)), b'</row>']
+        position = end
+    parts.append(sheet[position:])
+    sheet = b''.join(parts)
+    if dimension is not None and last_column > openpyxl.utils.column_index_from_string(
+            dimension.group(1).decode()):
+        sheet = SHEET_DIMENSION.sub(
+            f'<dimension ref="A1:{openpyxl.utils.get_column_letter(last_column)}'.encode() +
+            dimension.group(2) + b'"/>', sheet, count=1)
+
+    root, ext = os.path.splitext(target_path)
+    tmp_path = f"{root}.tmp{ext}"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for info, data in entries:
+            archive.writestr(info, sheet if data is None else data)
+    os.replace(tmp_path, target_path)
+    write_roster_cache(target, target_path)
+
+
+def save_changes(
+    target: pd.DataFrame,
+    target_path: str,
+    changes: dict[tuple[str, str], object],
+):
+    """Patch the changed cells into the excel file, or export it if patching fails.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        target_path (str): The path of the target file.
+        changes (dict[tuple[str, str], object]): The value by (student id, column).
+    """
+    try:
+        patch_workbook(target, target_path, changes)
+    except (KeyError, ValueError) as err:
+        print(
+            Fore.YELLOW + f"| Cannot patch the excel file ({err}), export it all." +
+            Style.RESET_ALL
+        )
+        export_workbook(target, target_path)
+
+
+def changed_cells(
+    target: pd.DataFrame,
+    before: dict[str, pd.Series],
+) -> dict[tuple[str, str], object]:
+    """Compare columns with their copy taken before a change.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        before (dict[str, pd.Series]): The copy of the columns. A column
+            that did not exist before is left to :func:`patch_workbook`.
+
+    Returns:
+        dict[tuple[str, str], object]: The value by (student id, column).
+    """
+    changes = {}
+    ids = target['學號'].astype(str)
+    for col, old in before.items():
+        old = old.set_axis(target.index)
+        changed = (target[col].astype(str) != old.astype(str)) & ~(target[col].isna() & old.isna())
+        for student_id, value in zip(ids[changed], target.loc[changed, col].tolist()):
+            changes[(student_id, col)] = value
+    return changes
+
+
+def journal_segments(target_path: str) -> list[str]:
+    """The journal files of the excel file, oldest first.
+
+    Besides '<excel file>.journal', the segments handed to a
+    :class:`BackgroundSaver` are kept as '<excel file>.journal.<n>'
+    until the save covering them succeeds.
+
+    Args:
+        target_path (str): The path of the target file.
+
+    Returns:
+        list[str]: The paths of the existing journal files.
+    """
+    journal_path = target_path + JOURNAL_SUFFIX
+    folder, prefix = os.path.split(journal_path)
+    numbered = sorted(
+        int(name[len(prefix) + 1:]) for name in os.listdir(folder or '.')
+        if name.startswith(prefix + '.') and name[len(prefix) + 1:].isdigit()
+    )
+    segments = [f"{journal_path}.{n}" for n in numbered]
+    if os.path.isfile(journal_path):
+        segments.append(journal_path)
+    return segments
+
+
+class BackgroundSaver:
+    """Write the excel file in a thread, so the prompt never waits for the disk.
+
+    The snapshots submitted while a write is running are coalesced: the
+    next write takes the latest dataframe and all the changed cells. The
+    journal segments covered by a write are removed once it succeeds.
+    After a failure they are kept, the write is retried with the next
+    snapshot, and the error is handed out once by :meth:`take_error`.
+
+    Args:
+        target_path (str): The path of the target file.
+    """
+
+    def __init__(self, target_path: str):
+        self.target_path = target_path
+        self._cond = threading.Condition()
+        self._target: Optional[pd.DataFrame] = None
+        self._changes: dict[tuple[str, str], object] = {}
+        self._segments: list[str] = []
+        self._failed = False
+        self._busy = False
+        self._closed = False
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        target: pd.DataFrame,
+        changes: dict[tuple[str, str], object],
+        segments: list[str],
+    ):
+        """Queue a snapshot to be written.
+
+        Args:
+            target (pd.DataFrame): The copy of the dataframe to be written.
+            changes (dict[tuple[str, str], object]): The value by (student id, column).
+            segments (list[str]): The journal files covered by the snapshot.
+        """
+        with self._cond:
+            self._target = target
+            self._changes.update(changes)
+            self._segments += segments
+            self._failed = False
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and (self._target is None or self._failed):
+                    self._cond.wait()
+                if self._target is None or self._failed:
+                    return
+                target, changes, segments = self._target, self._changes, self._segments
+                self._target, self._changes, self._segments = None, {}, []
+                self._busy = True
+            try:
+                save_changes(target, self.target_path, changes)
+            except Exception as err:  # pylint: disable=broad-except
+                # e.g. the file is opened in Excel, keep everything for the next write
+                with self._cond:
+                    if self._target is None:
+                        self._target = target
+                    self._changes = {**changes, **self._changes}
+                    self._segments = segments + self._segments
+                    self._failed = True
+                    self._error = err
+            else:
+                for segment in segments:
+                    if os.path.isfile(segment):
+                        os.remove(segment)
+                with self._cond:
+                    self._error = None
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def take_error(self) -> Optional[Exception]:
+        """The error of the last failed write, once.
+
+        Returns:
+            Optional[Exception]: The error, None if there is none to report.
+        """
+        with self._cond:
+            error, self._error = self._error, None
+        return error
+
+    def flush(self) -> Optional[Exception]:
+        """Wait until the latest snapshot is written, retrying a failed write once.
+
+        Returns:
+            Optional[Exception]: The error if the write still fails.
+        """
+        retried = False
+        with self._cond:
+            while self._busy or self._target is not None:
+                if not self._busy and self._failed:
+                    if retried:
+                        break
+                    retried = True
+                    self._failed = False
+                    self._cond.notify_all()
+                self._cond.wait()
+        return self.take_error()
+
+    def close(self) -> Optional[Exception]:
+        """Flush and stop the thread.
+
+        Returns:
+            Optional[Exception]: The error if the last write failed.
+        """
+        error = self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        return error
+
+
+class CheckinJournal:
+    """Append-only journal of the assignments made in a session.
+
+    Every assignment is written as one json line
+    ``{"id": ..., "col": ..., "value": ..., "ts": ...}`` and fsynced
+    before the next prompt, so recording a student costs the same
+    whatever the size of the workbook. The journal is folded back into
+    the workbook every ``flush_every`` entries and on exit, by patching
+    only the cells changed since the last fold.
+
+    With ``background=True`` folding only hands a copy of the dataframe
+    to a :class:`BackgroundSaver` and moves the journal aside as a
+    segment, so the prompt does not wait for the excel file to be written.
+
+    Args:
+        target_path (str): The path of the target file.
+        flush_every (int, optional): Fold the journal into the workbook
+            after this many entries. ``0`` only folds on exit.
+        background (bool, optional): Write the workbook in a thread.
+    """
+
+    def __init__(self, target_path: str, flush_every: int = 20, background: bool = False):
+        self.target_path = target_path
+        self.path = target_path + JOURNAL_SUFFIX
+        self.flush_every = flush_every
+        self.pending = 0
+        self.dirty: dict[tuple[str, str], object] = {}
+        self.known_columns: Optional[list[str]] = None
+        self.saver = BackgroundSaver(target_path) if background else None
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, student_id: str, col: str, value):
+        """Record one assignment.
+
+        Args:
+            student_id (str): The student id.
+            col (str): The column name.
+            value (str | float): The value assigned.
+        """
+        self.extend([(student_id, col, value)])
+
+    def extend(self, entries: Iterable[tuple[str, str, object]]):
+        """Record a batch of assignments with a single fsync.
+
+        Args:
+            entries (Iterable[tuple[str, str, object]]):
+                The (student id, column, value) of each assignment.
+        """
+        now = time.time()
+        lines = []
+        for student_id, col, value in entries:
+            lines.append(json.dumps({
+                'id': str(student_id),
+                'col': col,
+                'value': value,
+                'ts': now,
+            }, ensure_ascii=False) + '\n')
+            self.dirty[(str(student_id), col)] = value
+        if len(lines) == 0:
+            return
+        self._file.write(''.join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.pending += len(lines)
+
+    def due(self) -> bool:
+        """Whether the journal should be folded into the workbook now.
+
+        Returns:
+            bool: True if ``flush_every`` entries are pending.
+        """
+        return self.flush_every > 0 and self.pending >= self.flush_every
+
+    def fold(self, target: pd.DataFrame):
+        """Write the workbook and empty the journal.
+
+        Args:
+            target (pd.DataFrame): Dataframe of the target file.
+        """
+        if all([
+            self.pending == 0,
+            os.path.getsize(self.path) == 0,
+            self.known_columns == list(target.columns),
+        ]):
+            return
+        if self.saver is not None:
+            self._file.close()
+            numbered = [
+                int(path.rsplit('.', 1)[1])
+                for path in journal_segments(self.target_path) if path != self.path]
+            segment = f"{self.path}.{max(numbered, default=0) + 1}"
+            os.replace(self.path, segment)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self.saver.submit(target.copy(), self.dirty, [segment])
+        else:
+            save_changes(target, self.target_path, self.dirty)
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.pending = 0
+        self.dirty = {}
+        self.known_columns = list(target.columns)
+
+    def take_error(self) -> Optional[Exception]:
+        """The error of a failed background write, once.
+
+        Returns:
+            Optional[Exception]: The error, None if there is none to report.
+        """
+        return None if self.saver is None else self.saver.take_error()
+
+    def close(self, target: Optional[pd.DataFrame] = None) -> Optional[Exception]:
+        """Fold the pending entries, wait for the writes and remove the journal file.
+
+        Args:
+            target (Optional[pd.DataFrame], optional): Dataframe of the target file.
+                If given, the pending entries are folded before closing.
+
+        Returns:
+            Optional[Exception]: The error if the last background write failed.
+                The journal is then kept, to be replayed on the next start.
+        """
+        if target is not None:
+            self.fold(target)
+        error = None if self.saver is None else self.saver.close()
+        self._file.close()
+        if os.path.isfile(self.path) and os.path.getsize(self.path) == 0:
+            os.remove(self.path)
+        return error
+
+
+def replay_journal(
+    target: pd.DataFrame,
+    target_path: str,
+    mode: Literal['attend', 'test', 'hw', "group"],
+) -> tuple[pd.DataFrame, dict[tuple[str, str], object]]:
+    """Apply the journal left behind by a crashed session.
+
+    A truncated last line, from a crash in the middle of a write, is skipped.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        target_path (str): The path of the target file.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+
+    Returns:
+        tuple[pd.DataFrame, dict[tuple[str, str], object]]:
+            The dataframe of the target file and the replayed value by
+            (student id, column), for :func:`save_changes`.
+    """
+    changes = {}
+    for journal_path in journal_segments(target_path):
+        with open(journal_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record['col'] not in target.columns:
+                    target = blank_column(target, record['col'], mode)
+                matched = np.flatnonzero(target['學號'].astype(str) == record['id'])
+                for row in matched:
+                    set_cell(target, row, record['col'], record['value'])
+                if len(matched) > 0:
+                    changes[(record['id'], record['col'])] = record['value']
+
+    return target, changes
+
+
+def plain_value(value):
+    """Turn a cell of the dataframe into a value sqlite and json can store.
+
+    Args:
+        value: The cell, e.g. a numpy number or NaN.
+
+    Returns:
+        The python value, None for a missing cell.
+    """
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class GradebookStore:
+    """Roster and marks of every course and mode in one SQLite database.
+
+    Each (course, mode) is a book: its columns in order, its roster rows
+    and its marks. The marks are keyed on (course, mode, 學號, column),
+    so recording an entry is a single indexed row update committed in
+    its own transaction, whatever the size of the roster. A book is
+    imported from its excel file the first time it is opened, and the
+    excel file is only written by :meth:`export`.
+
+    Args:
+        db_path (str): The path of the database file.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS columns (
+            course TEXT, mode TEXT, position INTEGER, name TEXT,
+            PRIMARY KEY (course, mode, name));
+        CREATE TABLE IF NOT EXISTS roster (
+            course TEXT, mode TEXT, position INTEGER, student_id TEXT, fields TEXT,
+            PRIMARY KEY (course, mode, position));
+        CREATE INDEX IF NOT EXISTS roster_student ON roster (course, mode, student_id);
+        CREATE TABLE IF NOT EXISTS marks (
+            course TEXT, mode TEXT, student_id TEXT, col TEXT, value, ts REAL,
+            PRIMARY KEY (course, mode, student_id, col)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS books (
+            course TEXT, mode TEXT, roster_schema INTEGER,
+            PRIMARY KEY (course, mode));
+    """
+
+    def __init__(self, db_path: str, reserved_col: Optional[list[str]] = None):
+        self.db_path = db_path
+        self.roster_col = list(reserved_col or RESERVED_COL) + ['序號']
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def books(self, course: Optional[str] = None) -> list[tuple[str, str]]:
+        """The books in the database.
+
+        Args:
+            course (Optional[str], optional): Only the books of this course.
+
+        Returns:
+            list[tuple[str, str]]: The (course, mode) of each book.
+        """
+        rows = self.conn.execute('SELECT DISTINCT course, mode FROM columns').fetchall()
+        return [(c, m) for c, m in rows if course is None or c == course]
+
+    def has_book(self, course: str, mode: str) -> bool:
+        """Whether the book is in the database.
+
+        Args:
+            course (str): The course.
+            mode (str): The mode.
+
+        Returns:
+            bool: True if the book was imported.
+        """
+        return self.conn.execute(
+            'SELECT 1 FROM columns WHERE course = ? AND mode = ? LIMIT 1', (course, mode)
+        ).fetchone() is not None
+
+    def import_frame(self, course: str, mode: str, target: pd.DataFrame):
+        """Replace the book by the dataframe, in one transaction.
+
+        Args:
+            course (str): The course.
+            mode (str): The mode.
+            target (pd.DataFrame): Dataframe of the target file.
+        """
+        ids = target['學號'].astype(str).tolist()
+        roster_col = [col for col in target.columns if col in self.roster_col]
+        fields = target[roster_col].astype(object).map(plain_value).to_dict('records')
+        now = time.time()
+        with self.conn:
+            for table in ('columns', 'roster', 'marks'):
+                self.conn.execute(
+                    f'DELETE FROM {table} WHERE course = ? AND mode = ?', (course, mode))
+            self.conn.executemany(
+                'INSERT INTO columns VALUES (?, ?, ?, ?)',
+                [(course, mode, i, col) for i, col in enumerate(target.columns)])
+            self.conn.executemany(
+                'INSERT INTO roster VALUES (?, ?, ?, ?, ?)',
+                [(course, mode, i, student_id, json.dumps(row, ensure_ascii=False))
+                 for i, (student_id, row) in enumerate(zip(ids, fields))])
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO marks VALUES (?, ?, ?, ?, ?, ?)',
+                [(course, mode, student_id, col, plain_value(value), now)
+                 for col in target.columns if col not in self.roster_col
+                 for student_id, value in zip(ids, target[col].tolist())])
+            self.conn.execute(
+                'INSERT OR REPLACE INTO books VALUES (?, ?, ?)',
+                (course, mode, target.attrs.get('roster_schema')))
+
+    def load(self, course: str, mode: str) -> pd.DataFrame:
+        """Read the book in the layout of its excel file.
+
+        Args:
+            course (str): The course.
+            mode (str): The mode.
+
+        Returns:
+            pd.DataFrame: Dataframe of the target file.
+        """
+        key = (course, mode)
+        columns = [name for (name,) in self.conn.execute(
+            'SELECT name FROM columns WHERE course = ? AND mode = ? ORDER BY position', key)]
+        roster = self.conn.execute(
+            'SELECT student_id, fields FROM roster WHERE course = ? AND mode = ? ORDER BY position',
+            key).fetchall()
+        target = pd.DataFrame([json.loads(fields) for _, fields in roster])
+        ids = pd.Series([student_id for student_id, _ in roster], dtype=object)
+        marks = pd.DataFrame(
+            self.conn.execute(
+                'SELECT student_id, col, value FROM marks WHERE course = ? AND mode = ?', key
+            ).fetchall(),
+            columns=['學號', 'col', 'value'])
+        by_col = marks.pivot(index='學號', columns='col', values='value').reindex(ids)
+        for col in columns:
+            if col not in target.columns:
+                target[col] = by_col[col].to_numpy() if col in by_col else None
+        target = target[columns]
+        schema = self.conn.execute(
+            'SELECT roster_schema FROM books WHERE course = ? AND mode = ?', key).fetchone()
+        if schema is not None and schema[0] is not None:
+            target.attrs['roster_schema'] = schema[0]
+        return target
+
+    def set_values(
+        self,
+        course: str,
+        mode: str,
+        entries: Iterable[tuple[str, str, object]],
+        new_columns: Optional[list[str]] = None,
+    ):
+        """Record assignments and new columns in one transaction.
+
+        Args:
+            course (str): The course.
+            mode (str): The mode.
+            entries (Iterable[tuple[str, str, object]]):
+                The (student id, column, value) of each assignment.
+            new_columns (Optional[list[str]], optional): The columns to add at the end.
+        """
+        now = time.time()
+        with self.conn:
+            if new_columns:
+                (end,) = self.conn.execute(
+                    'SELECT COALESCE(MAX(position) + 1, 0) FROM columns WHERE course = ? AND mode = ?',
+                    (course, mode)).fetchone()
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO columns VALUES (?, ?, ?, ?)',
+                    [(course, mode, end + i, col) for i, col in enumerate(new_columns)])
+            self.conn.executemany(
+                'INSERT INTO marks VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (course, mode, student_id, col) '
+                'DO UPDATE SET value = excluded.value, ts = excluded.ts',
+                [(course, mode, str(student_id), col, plain_value(value), now)
+                 for student_id, col, value in entries])
+
+    def export(self, course: str, mode: str, target_path: str):
+        """Write the book to its excel file.
+
+        Only the cells differing from the excel file are patched in, see
+        :func:`save_changes`, so the layout of the workbook is kept. A
+        missing excel file is exported in full.
+
+        Args:
+            course (str): The course.
+            mode (str): The mode.
+            target_path (str): The path of the target file.
+        """
+        target = self.load(course, mode)
+        if not os.path.isfile(target_path):
+            export_workbook(target, target_path)
+            return
+        try:
+            sheet = read_copy(target_path, mode).set_index('學號')
+        except ValueError:
+            sheet = None
+        ids = target['學號'].astype(str)
+        if sheet is None or set(sheet.index.astype(str)) != set(ids):
+            # the excel file does not have the students of the book
+            export_workbook(target, target_path)
+            return
+        before = {
+            col: sheet[col].reindex(ids).reset_index(drop=True)
+            for col in target.columns if col in sheet.columns and col != '學號'}
+        save_changes(target, target_path, changed_cells(target, before))
+
+    def close(self):
+        """Close the database."""
+        self.conn.close()
+
+
+class StoreJournal:
+    """The :class:`CheckinJournal` of a book kept in a :class:`GradebookStore`.
+
+    Every entry is committed to the database at once, so there is
+    nothing to fold: folding only adds the new columns of the dataframe,
+    with their current values. An entry in a column not in the book yet
+    adds the column first.
+
+    Args:
+        store (GradebookStore): The database.
+        course (str): The course.
+        mode (str): The mode.
+        target (pd.DataFrame): Dataframe of the target file, as loaded.
+            The columns are added to it in place while the session runs.
+    """
+
+    def __init__(self, store: GradebookStore, course: str, mode: str, target: pd.DataFrame):
+        self.store = store
+        self.course = course
+        self.mode = mode
+        self.target = target
+        self.pending = 0
+        self.known_columns = list(target.columns)
+
+    def append(self, student_id: str, col: str, value):
+        """Record one assignment.
+
+        Args:
+            student_id (str): The student id.
+            col (str): The column name.
+            value (str | float): The value assigned.
+        """
+        self.extend([(student_id, col, value)])
+
+    def extend(self, entries: Iterable[tuple[str, str, object]]):
+        """Record a batch of assignments in one transaction.
+
+        Args:
+            entries (Iterable[tuple[str, str, object]]):
+                The (student id, column, value) of each assignment.
+        """
+        entries = list(entries)
+        if any(col not in self.known_columns for _, col, _ in entries):
+            self.fold(self.target)
+        self.store.set_values(self.course, self.mode, entries)
+
+    def due(self) -> bool:
+        """Never, the entries are already in the database.
+
+        Returns:
+            bool: False.
+        """
+        return False
+
+    def fold(self, target: pd.DataFrame):
+        """Add the new columns of the dataframe to the book.
+
+        Args:
+            target (pd.DataFrame): Dataframe of the target file.
+        """
+        new_columns = [col for col in target.columns if col not in self.known_columns]
+        if len(new_columns) == 0:
+            return
+        ids = target['學號'].astype(str).tolist()
+        self.store.set_values(self.course, self.mode, [
+            (student_id, col, value)
+            for col in new_columns
+            for student_id, value in zip(ids, target[col].tolist())
+        ], new_columns)
+        self.known_columns += new_columns
+
+    def take_error(self) -> Optional[Exception]:
+        """Nothing is written in the background.
+
+        Returns:
+            Optional[Exception]: None.
+        """
+        return None
+
+    def close(self, target: Optional[pd.DataFrame] = None) -> Optional[Exception]:
+        """Add the new columns of the dataframe, if given.
+
+        Args:
+            target (Optional[pd.DataFrame], optional): Dataframe of the target file.
+
+        Returns:
+            Optional[Exception]: None.
+        """
+        if target is not None:
+            self.fold(target)
+        return None
+
+
+def name_grams(name: str) -> set[str]:
+    """The character unigrams and bigrams of the Chinese part of a name.
+
+    Only the leading CJK characters of a registrar name such as
+    '劉芷妤LIOU,ZHI-YU' are used, see :func:`name_keys`, so the
+    romanization does not dilute the score of a Chinese query.
+
+    Args:
+        name (str): The name.
+
+    Returns:
+        set[str]: The grams.
+    """
+    found = CJK_RUN.match(name)
+    if found is not None:
+        name = found.group()
+    return set(name) | {name[i:i + 2] for i in range(len(name) - 1)}
+
+
+class RosterIndex:
+    """Lookup index over the 學號 and 姓名 of the roster.
+
+    The index is built once when the excel file is loaded. 學號 are kept
+    in a dict for exact match and sorted for partial ids, found by
+    bisection, and every character of 姓名 is mapped to the rows
+    containing it, so a partial name is only searched in the rows of its
+    rarest character instead of scanning the dataframe.
+    Mistyped 學號 are scored with :func:`damerau_levenshtein_distance_np`
+    against the 學號 of each length within the distance bound, and partial,
+    reordered or mistyped 姓名 are ranked by the character unigrams and
+    bigrams they share with the query. All lookups return the row
+    positions in the dataframe.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+    """
+
+    def __init__(self, target: pd.DataFrame):
+        self.ids: list[str] = [str(x) for x in target['學號']]
+        self.names: list[str] = [str(x) for x in target['姓名']]
+        self.id_to_row: dict[str, int] = {}
+        self.name_chars: dict[str, list[int]] = {}
+        self.name_grams: dict[str, list[int]] = {}
+        self.gram_counts: list[int] = []
+        self.ids_by_length: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+        for row, student_id in enumerate(self.ids):
+            self.id_to_row.setdefault(student_id, row)
+        self.id_order: list[int] = sorted(range(len(self.ids)), key=self.ids.__getitem__)
+        self.sorted_ids: list[str] = [self.ids[row] for row in self.id_order]
+        lengths: dict[int, list[int]] = {}
+        for row, student_id in enumerate(self.ids):
+            lengths.setdefault(len(student_id), []).append(row)
+        for width, rows in lengths.items():
+            self.ids_by_length[width] = (
+                np.array(rows), np.array([self.ids[row] for row in rows], dtype=f'<U{max(width, 1)}'))
+
+        for row, name in enumerate(self.names):
+            for char in set(name):
+                self.name_chars.setdefault(char, []).append(row)
+            grams = name_grams(name)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.name_grams.setdefault(gram, []).append(row)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row_of(self, student_id: str) -> Optional[int]:
+        """The row of the student id.
+
+        Args:
+            student_id (str): The student id.
+
+        Returns:
+            Optional[int]: The row position, None if not found.
+        """
+        return self.id_to_row.get(str(student_id))
+
+    def find_id(self, query: str) -> list[int]:
+        """Find the rows whose 學號 is or starts with the query.
+
+        Args:
+            query (str): The full or partial student id.
+
+        Returns:
+            list[int]: The row positions, the exact match only if there is one.
+        """
+        row = self.id_to_row.get(query)
+        if row is not None:
+            return [row]
+        if len(query) == 0:
+            return []
+        begin = bisect.bisect_left(self.sorted_ids, query)
+        end = bisect.bisect_left(self.sorted_ids, query[:-1] + chr(ord(query[-1]) + 1))
+        return sorted(self.id_order[begin:end])
+
+    def find_name(self, query: str) -> list[int]:
+        """Find the rows whose 姓名 contains the query.
+
+        Args:
+            query (str): The full or partial name.
+
+        Returns:
+            list[int]: The row positions.
+        """
+        if len(query) == 0:
+            return []
+        candidates = min((self.name_chars.get(char, []) for char in set(query)), key=len)
+        if len(query) == 1:
+            return candidates
+        return [row for row in candidates if query in self.names[row]]
+
+    def lookup(self, query: str) -> tuple[Literal['id', 'name', ''], list[int]]:
+        """Find the rows by 學號 first, then by 姓名.
+
+        Args:
+            query (str): The full or partial student id or name.
+
+        Returns:
+            tuple[Literal['id', 'name', ''], list[int]]:
+                Which column matched and the row positions, ('', []) if none.
+        """
+        query = unicodedata.normalize('NFKC', query).strip()
+        rows = self.find_id(query)
+        if len(rows) > 0:
+            return 'id', rows
+        rows = self.find_name(query)
+        if len(rows) > 0:
+            return 'name', rows
+        return '', []
+
+    def similar_ids(
+        self,
+        query: str,
+        max_distance: int = 3,
+        top_k: int = 5,
+    ) -> list[tuple[int, int]]:
+        """Find the 學號 close to a mistyped query.
+
+        Args:
+            query (str): The mistyped student id.
+            max_distance (int, optional): The maximum edit distance.
+            top_k (int, optional): The number of results to return.
+
+        Returns:
+            list[tuple[int, int]]: The (distance, row) pairs, closest first.
+        """
+        query = unicodedata.normalize('NFKC', query).strip()
+        if len(query) == 0:
+            return []
+        found: list[tuple[int, int]] = []
+        for width, (rows, ids) in self.ids_by_length.items():
+            # the length alone already differs by more than the bound
+            if abs(width - len(query)) > max_distance:
+                continue
+            dist = damerau_levenshtein_distance_np(query, ids, max_distance)
+            close = np.flatnonzero(dist <= max_distance)
+            found.extend(zip(dist[close].tolist(), rows[close].tolist()))
+        found.sort()
+        return found[:top_k]
+
+    def similar_names(
+        self,
+        query: str,
+        min_score: float = 0.4,
+        top_k: int = 5,
+    ) -> list[tuple[float, int]]:
+        """Find the 姓名 sharing the most character unigrams and bigrams
+        with a partial, reordered or mistyped query.
+
+        Args:
+            query (str): The name.
+            min_score (float, optional): The minimum Dice coefficient of the grams.
+            top_k (int, optional): The number of results to return.
+
+        Returns:
+            list[tuple[float, int]]: The (score, row) pairs, best first.
+        """
+        grams = name_grams(unicodedata.normalize('NFKC', query).strip())
+        if len(grams) == 0:
+            return []
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self.name_grams.get(gram, ()))
+        scores = (
+            (2 * count / (len(grams) + self.gram_counts[row]), row)
+            for row, count in shared.items()
+        )
+        return heapq.nsmallest(
+            top_k,
+            ((score, row) for score, row in scores if score >= min_score),
+            key=lambda pair: (-pair[0], pair[1]),
+        )
+
+
+def mode_and_target(
+    mode: Literal['attend', 'test', 'hw', "group"],
+    file_locations: dict[Literal['attend', 'test', 'hw', "group"], str],
+    reserved_col: Optional[list[str]] = None,
+    store: Optional[GradebookStore] = None,
+    course: str = DEFAULT_COURSE,
+) -> tuple[pd.DataFrame, Literal['attend', 'test', 'hw', "group"], str, RosterIndex]:
+    """Setup the mode and target file.
+
+    Args:
+        mode (str): Description
+        file_locations (dict[Literal['attend', 'test', 'hw', "group"], str]): Description
+        reserved_col (Optional[list[str]], optional): Description
+        store (Optional[GradebookStore], optional): The database keeping the books.
+        course (str, optional): The course of the book in the database.
+
+    Returns:
+        tuple[pd.DataFrame, Literal['attend', 'test', 'hw', "group"], str, RosterIndex]:
+            The dataframe, the mode, the path of the target file and the roster index.
+    """
+
+    if reserved_col is None:
+        reserved_col = RESERVED_COL
+
+    target_path: str = ''
+    while all([mode != "hw", mode != "attend", mode != "test", mode != "group"]):
+        mode = input(
+            Fore.BLUE + "| 輸入 'attend' 開始點名 / 'hw' 開始登記作業 / 'group' 開始登記小組互評: " + Style.RESET_ALL)
+        if all([mode != "hw", mode != "attend", mode != "test", mode != "group"]):
+            print(
+                Fore.RED + Style.BRIGHT +
+                'ERROR! Plz check the mode!' + Style.RESET_ALL
+            )
+    if mode == "hw":
+        target_path = file_locations['hw']
+    elif mode == "attend":
+        target_path = file_locations['attend']
+    elif mode == "group":
+        target_path = file_locations['group']
+    else:
+        target_path = file_locations['test']
+
+    target, index = load_workbook(target_path, mode, reserved_col, store, course)
+
+    return target, mode, target_path, index
+
+
+def load_workbook(
+    target_path: str,
+    mode: Literal['attend', 'test', 'hw', "group"],
+    reserved_col: Optional[list[str]] = None,
+    store: Optional[GradebookStore] = None,
+    course: str = DEFAULT_COURSE,
+) -> tuple[pd.DataFrame, RosterIndex]:
+    """Read the excel file, replay its journal and build its roster index.
+
+    With a store, the book is read from the database instead, and imported
+    from the excel file the first time.
+
+    Args:
+        target_path (str): The path of the target file.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
+        store (Optional[GradebookStore], optional): The database keeping the book.
+        course (str, optional): The course of the book in the database.
+
+    Raises:
+        ValueError: If a reserved column is missing from the excel file.
+
+    Returns:
+        tuple[pd.DataFrame, RosterIndex]: The dataframe and the roster index.
+    """
+    if reserved_col is None:
+        reserved_col = RESERVED_COL
+
+    in_store = store is not None and store.has_book(course, mode)
+    target = store.load(course, mode) if in_store else read_workbook(target_path)
+    missing = [col for col in reserved_col if col not in target.columns]
+    if len(missing) > 0:
+        raise ValueError(f"'{target_path}' has no column {missing}.")
+    if mode != 'group':
+        target = compact_marks(target, reserved_col)
+    if target.attrs.get('roster_schema') != ROSTER_SCHEMA:
+        target = normalize_roster(target)
+        if in_store:
+            store.import_frame(course, mode, target)
+        else:
+            write_roster_cache(target, target_path)
+    if in_store:
+        return target, load_roster_index(target, target_path)
+
+    target, replayed = replay_journal(target, target_path, mode)
+    if len(replayed) > 0:
+        print(
+            Fore.YELLOW + Style.BRIGHT +
+            f"| Replayed {len(replayed)} cells from unfinished session." +
+            Style.RESET_ALL
+        )
+        save_changes(target, target_path, replayed)
+    for journal_path in journal_segments(target_path):
+        os.remove(journal_path)
+    if store is not None:
+        store.import_frame(course, mode, target)
+        print(f"| Imported '{target_path}' into '{store.db_path}'")
+
+    return target, load_roster_index(target, target_path)
+
+
+def check_workbook(
+    target_path: str,
+    mode: Literal['attend', 'test', 'hw', "group"],
+    reserved_col: Optional[list[str]] = None,
+) -> tuple[pd.DataFrame, RosterIndex]:
+    """Read the excel file like :func:`load_workbook`, writing nothing.
+
+    The journal is replayed in memory only, and neither the caches nor
+    the journal are touched, so the files can be checked while they are
+    open in a session or the daemon.
+
+    Args:
+        target_path (str): The path of the target file.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
+
+    Raises:
+        ValueError: If a reserved column is missing or a 學號 is repeated.
+
+    Returns:
+        tuple[pd.DataFrame, RosterIndex]: The dataframe and the roster index.
+    """
+    target = read_copy(target_path, mode, reserved_col)
+    return target, RosterIndex(target)
+
+
+def load_workbooks(
+    locations: dict[str, dict[Literal['attend', 'test', 'hw', "group"], str]],
+    reserved_col: Optional[list[str]] = None,
+    max_workers: Optional[int] = None,
+    read_only: bool = False,
+) -> dict[tuple[str, str], tuple[pd.DataFrame, str, RosterIndex]]:
+    """Load the excel files of every course in parallel.
+
+    The files are parsed in a process pool, so opening many sections
+    costs about the time of the slowest file. A file that is missing or
+    fails the validation of :func:`load_workbook` is reported and skipped.
+
+    Args:
+        locations (dict[str, dict[Literal['attend', 'test', 'hw', "group"], str]]):
+            The file location of the supported files of each course.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
+        max_workers (Optional[int], optional): The number of processes, default to the cpu count.
+        read_only (bool, optional): Read the files with :func:`check_workbook` instead.
+
+    Returns:
+        dict[tuple[str, str], tuple[pd.DataFrame, str, RosterIndex]]:
+            The dataframe, the path and the roster index by (course, mode).
+    """
+    jobs = {
+        (course, mode): path
+        for course, files in locations.items()
+        for mode, path in files.items()
+        if os.path.isfile(path)
+    }
+    for course, files in locations.items():
+        for mode, path in files.items():
+            if (course, mode) not in jobs:
+                print(Fore.RED + f"| Skip '{course}' '{mode}', file not found: {path}" + Style.RESET_ALL)
+
+    # a single file is not worth starting the processes
+    workers = max(1, min(len(jobs), max_workers or os.cpu_count() or 1))
+    pool_type = ProcessPoolExecutor if workers > 1 else ThreadPoolExecutor
+    loaded = {}
+    load = check_workbook if read_only else load_workbook
+    with pool_type(max_workers=workers) as pool:
+        futures = {
+            key: pool.submit(load, path, key[1], reserved_col)
+            for key, path in jobs.items()
+        }
+        for key, future in futures.items():
+            try:
+                loaded[key] = future.result()
+            except ValueError as err:
+                print(Fore.RED + f"| Skip '{key[0]}' '{key[1]}': {err}" + Style.RESET_ALL)
+
+    return {
+        key: (target, jobs[key], index)
+        for key, (target, index) in loaded.items()
+    }
+
+
+def fold_width(values: pd.Series) -> pd.Series:
+    """Fold full-width digits, letters and spaces to ASCII (NFKC).
+
+    Args:
+        values (pd.Series): The values, missing ones become ''.
+
+    Returns:
+        pd.Series: The folded text.
+    """
+    return values.astype(object).map(
+        lambda x: '' if pd.isna(x) else unicodedata.normalize('NFKC', str(x)))
+
+
+def normalize_roster(target: pd.DataFrame) -> pd.DataFrame:
+    """Canonicalize the roster columns, once when the excel file is loaded.
+
+    - 學號: text, width-folded and stripped, without the '.0' of an id
+      read as a number.
+    - 姓名 and 系級: width-folded, stripped, and inner whitespace
+      collapsed to one space.
+    - 組別: the group code only, '' for students not in any group yet.
+
+    :data:`ROSTER_SCHEMA` is kept in ``target.attrs['roster_schema']``
+    and saved with the roster cache, so the next loads skip this.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+
+    Returns:
+        pd.DataFrame: The dataframe of the target file.
+    """
+    target['學號'] = fold_width(target['學號']).str.strip().str.replace(r'\.0$', '', regex=True)
+    for col in ('姓名', '系級'):
+        target[col] = fold_width(target[col]).str.strip().str.replace(r'\s+', ' ', regex=True)
+    target['組別'] = fold_width(target['組別']).map(group_code)
+    target.attrs['roster_schema'] = ROSTER_SCHEMA
+    return target
+
+
+def prepare_col(
+    target: pd.DataFrame,
+    col: str,
+    mode: Literal['attend', 'test', 'hw', "group"],
+) -> pd.DataFrame:
+    """Add the column if missing and cast it to the type of the mode.
+
+    The non-interactive part of :func:`check_col`.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        col (str): The column name to be prepared.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+
+    Returns:
+        pd.DataFrame: The dataframe of the target file.
+    """
+    if col not in target.columns:
+        target = blank_column(target, col, mode)
+    elif mode == 'group':
+        target[col] = target[col].astype(float)
+    else:
+        target[col] = mark_column(target[col])
+    return target
+
+
+def check_col(
+    target: pd.DataFrame,
+    col: str,
+    mode: Literal['attend', 'test', 'hw', "group"],
+) -> tuple[pd.DataFrame, bool]:
+    """Check the column in the target file.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        col (str): The column name to be checked.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+
+    Returns:
+        tuple[pd.DataFrame, bool]:
+            The dataframe of the target file and the flag of whether the column is added.
+    """
+
+    is_add = col in target.columns or ask_new_column(col)
+    if is_add:
+        target = prepare_col(target, col, mode)
+
+    return target, is_add
+
+
+class PhaseProfiler:
+    """Record how long each phase of an entry takes.
+
+    Used as ``with profiler.phase('lookup'): ...``. A disabled profiler
+    records nothing and costs a no-op context manager per phase.
+
+    Args:
+        enabled (bool, optional): Whether to record the timings.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.samples: dict[str, list[float]] = {}
+
+    def phase(self, name: str):
+        """Time the block under ``name``.
+
+        Args:
+            name (str): The name of the phase.
+
+        Returns:
+            ContextManager: The context timing the block.
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+    def summary(self) -> pd.DataFrame:
+        """The count, p50, p95 and max of each phase in ms.
+
+        Returns:
+            pd.DataFrame: The summary by phase.
+        """
+        return pd.DataFrame({
+            name: {
+                'count': len(values),
+                'p50': np.percentile(values, 50) * 1e3,
+                'p95': np.percentile(values, 95) * 1e3,
+                'max': max(values) * 1e3,
+            }
+            for name, values in self.samples.items()
+        }).T
+
+    def dump(self, path: str):
+        """Write the raw samples in seconds to a json file.
+
+        Args:
+            path (str): The path of the json file.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.samples, f, indent=2)
+
+
+@contextmanager
+def key_mode():
+    """Let :func:`read_key` read the keys one by one, without echo.
+
+    The terminal mode is restored on exit, also on Ctrl-C.
+    """
+    if os.name == 'nt':
+        yield
+        return
+    import termios  # pylint: disable=import-outside-toplevel
+    import tty  # pylint: disable=import-outside-toplevel
+    fd = sys.stdin.fileno()
+    old_mode = termios.tcgetattr(fd)
+    tty.setcbreak(fd, termios.TCSANOW)
+    try:
+        yield
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, old_mode)
+
+
+def read_key() -> str:
+    """Read one key press, inside :func:`key_mode`.
+
+    Returns:
+        str: The character typed, or 'UP' and 'DOWN' for the arrow keys.
+    """
+    if os.name == 'nt':
+        import msvcrt  # pylint: disable=import-outside-toplevel
+        key = msvcrt.getwch()
+        if key in ('\x00', '\xe0'):
+            return {'H': 'UP', 'P': 'DOWN'}.get(msvcrt.getwch(), '')
+        return key
+
+    import select  # pylint: disable=import-outside-toplevel
+    fd = sys.stdin.fileno()
+    data = os.read(fd, 1)
+    if data == b'\x1b':
+        if select.select([fd], [], [], 0.05)[0]:
+            return {b'[A': 'UP', b'[B': 'DOWN'}.get(os.read(fd, 2), '')
+        return '\x1b'
+    # a character typed through an IME is several bytes in utf-8
+    size = 1 if data[0] < 0xc0 else 2 if data[0] < 0xe0 else 3 if data[0] < 0xf0 else 4
+    while len(data) < size:
+        data += os.read(fd, size - len(data))
+    return data.decode('utf-8', errors='ignore')
+
+
+def live_search(
+    target: pd.DataFrame,
+    mode: Literal['attend', 'test', 'hw', "group"],
+    titles: list[str],
+    index: RosterIndex,
+    top_k: int = 5,
+    profiler: Optional[PhaseProfiler] = None,
+) -> tuple[str, Optional[int], str]:
+    """Search the students as the query is typed.
+
+    After each key the top matches of :meth:`RosterIndex.lookup` are
+    redrawn under the prompt. UP/DOWN or TAB move the selection, ENTER
+    confirms it, and in mode 'attend' and 'hw' '/' confirms it as
+    day-off. ESC clears the query.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        titles (list[str]): The columns shown with the candidates.
+        index (RosterIndex): The lookup index of the roster.
+        top_k (int, optional): The number of candidates shown.
+        profiler (Optional[PhaseProfiler], optional): The timing of each key.
+
+    Returns:
+        tuple[str, Optional[int], str]:
+            The query, the row confirmed, and the check '' or 'l' for day-off.
+            The row is None if ENTER is pressed without any candidate, for
+            '0', 'end' and group queries.
+    """
+    if profiler is None:
+        profiler = PhaseProfiler(enabled=False)
+    columns = [target.columns.get_loc(col) for col in ['組別'] + titles]
+    query, selected, drawn = '', 0, 0
+    rows: list[int] = []
+    while True:
+        with profiler.phase('live'):
+            if query in ['0', 'end'] or query.startswith(GROUP_PREFIX):
+                rows = []
+            else:
+                rows = index.lookup(query)[1] if len(query) > 0 else []
+                if len(rows) == 0 and len(query) > 1 and not query.isdigit():
+                    rows = [row for _, row in index.similar_names(query)]
+            selected = min(selected, max(len(rows), 1) - 1)
+            lines = [
+                (Fore.GREEN + '> ' if i == selected else '  ') +
+                f"{index.ids[row]}  {index.names[row]}  " +
+                '  '.join(str(target.iat[row, col]) for col in columns) +
+                Style.RESET_ALL
+                for i, row in enumerate(rows[:top_k])
+            ]
+            if len(rows) > top_k:
+                lines.append(f"  ... {len(rows) - top_k} more")
+            screen = ('\r' + (f"\x1b[{drawn}A" if drawn > 0 else '') + '\x1b[J' +
+                      ''.join(line + '\n' for line in lines) +
+                      Fore.BLUE + '>>> ' + Style.RESET_ALL + query)
+            sys.stdout.write(screen)
+            sys.stdout.flush()
+            drawn = len(lines)
+
+        key = read_key()
+        if key in ('\r', '\n') or (key == '/' and mode != 'group' and len(rows) > 0):
+            sys.stdout.write('\r' + (f"\x1b[{drawn}A" if drawn > 0 else '') + '\x1b[J' +
+                             Fore.BLUE + '>>> ' + Style.RESET_ALL + query + '\n')
+            if len(rows) == 0:
+                return query, None, ''
+            return query, rows[selected], 'l' if key == '/' else ''
+        if key in ('\x7f', '\b'):
+            query = query[:-1]
+        elif key == '\x1b':
+            query = ''
+        elif key == 'UP':
+            selected = max(selected - 1, 0)
+        elif key in ('DOWN', '\t'):
+            selected = min(selected + 1, min(len(rows), top_k) - 1) if len(rows) > 0 else 0
+        elif key == '\x03':
+            raise KeyboardInterrupt
+        elif key == '\x04':
+            raise EOFError
+        elif key.isprintable():
+            query += key
+            selected = 0
+
+
+class RollcallSession:
+    """The rollcall of one book, without any prompt.
+
+    Choosing the columns, looking the students up, writing the marks or
+    scores and saving go through this class, whether they come from the
+    terminal (:func:`handle_input`), the kiosk or a script. Every write is
+    recorded in the journal, which is folded into the book when it is due.
+
+    ```python
+    session = RollcallSession.open('attend', {'attend': './出席.xlsx'})
+    session.select_columns(['1011'])
+    session.assign_many([('110201001', '1'), ('110201002', '假')])
+    session.close()
+    ```
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        target_path (str): The path of the target file.
+        journal (Optional[CheckinJournal], optional): The journal recording the entries.
+            A journal of the target file by default.
+        index (Optional[RosterIndex], optional): The lookup index of the roster.
+            Built from the target by default.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
+        profiler (Optional[PhaseProfiler], optional): The timing of each phase of the entries.
+    """
+
+    def __init__(
+        self,
+        target: pd.DataFrame,
+        mode: Literal['attend', 'test', 'hw', "group"],
+        target_path: str,
+        journal: Optional[CheckinJournal] = None,
+        index: Optional[RosterIndex] = None,
+        reserved_col: Optional[list[str]] = None,
+        profiler: Optional[PhaseProfiler] = None,
+    ):
+        self.target = target
+        self.mode = mode
+        self.target_path = target_path
+        self.journal = journal if journal is not None else CheckinJournal(target_path)
+        self.index = index if index is not None else RosterIndex(target)
+        self.reserved_col = reserved_col if reserved_col is not None else RESERVED_COL
+        self.profiler = profiler if profiler is not None else PhaseProfiler(enabled=False)
+        self.titles: list[str] = []
+
+    @classmethod
+    def open(
+        cls,
+        mode: Literal['attend', 'test', 'hw', "group"],
+        file_locations: dict[Literal['attend', 'test', 'hw', "group"], str],
+        reserved_col: Optional[list[str]] = None,
+        store: Optional[GradebookStore] = None,
+        course: str = DEFAULT_COURSE,
+        flush_every: int = 20,
+        background: bool = False,
+        profiler: Optional[PhaseProfiler] = None,
+    ) -> 'RollcallSession':
+        """Load the book of the mode and open its journal.
+
+        Args:
+            mode (Literal['attend', 'test', 'hw', "group"]): The mode.
+            file_locations (dict[Literal['attend', 'test', 'hw', "group"], str]):
+                The excel file of each mode.
+            reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
+            store (Optional[GradebookStore], optional): The database keeping the books.
+            course (str, optional): The course of the book in the database.
+            flush_every (int, optional): Fold the journal every N entries, 0 for only on close.
+            background (bool, optional): Write the excel file in a background thread.
+            profiler (Optional[PhaseProfiler], optional): The timing of each phase of the entries.
+
+        Raises:
+            KeyError: If the mode has no file.
+
+        Returns:
+            RollcallSession: The session.
+        """
+        if mode not in file_locations:
+            raise KeyError(f"no file of mode '{mode}'")
+        target_path = file_locations[mode]
+        target, index = load_workbook(target_path, mode, reserved_col, store, course)
+        if store is not None:
+            journal = StoreJournal(store, course, mode, target)
+        else:
+            journal = CheckinJournal(target_path, flush_every=flush_every, background=background)
+        return cls(target, mode, target_path, journal, index, reserved_col, profiler)
+
+    def select_columns(self, titles: list[str], add: bool = True) -> list[str]:
+        """Choose the columns the entries are written to.
+
+        Args:
+            titles (list[str]): The column names, several only in mode 'group'.
+            add (bool, optional): Add the missing columns.
+
+        Raises:
+            KeyError: If a column is missing and not added.
+            ValueError: If several columns are given out of mode 'group'.
+
+        Returns:
+            list[str]: The selected columns.
+        """
+        if len(titles) == 0 or (self.mode != 'group' and len(titles) > 1):
+            raise ValueError(f"mode '{self.mode}' takes one column, not {titles}")
+        missing = [col for col in titles if col not in self.target.columns]
+        if len(missing) > 0 and not add:
+            raise KeyError(f"columns {missing} not found")
+        for col in titles:
+            self.target = prepare_col(self.target, col, self.mode)
+        self.titles = list(titles)
+        return self.titles
+
+    def row_of(self, student) -> int:
+        """The row of a student.
+
+        Args:
+            student (int | str): The row position or the student id.
+
+        Raises:
+            KeyError: If the student id is not found.
+
+        Returns:
+            int: The row position.
+        """
+        if isinstance(student, (int, np.integer)):
+            return int(student)
+        row = self.index.row_of(unicodedata.normalize('NFKC', str(student)).strip())
+        if row is None:
+            raise KeyError(f"student '{student}' not found")
+        return row
+
+    def lookup(self, query: str) -> tuple[Literal['id', 'name', ''], list[int]]:
+        """Find the rows by 學號 first, then by 姓名, see :meth:`RosterIndex.lookup`.
+
+        Args:
+            query (str): The full or partial student id or name.
+
+        Returns:
+            tuple[Literal['id', 'name', ''], list[int]]:
+                Which column matched and the row positions, ('', []) if none.
+        """
+        with self.profiler.phase('lookup'):
+            return self.index.lookup(query)
+
+    def similar(self, query: str) -> tuple[list[int], list[int]]:
+        """Find the students close to a query that matched nobody.
+
+        Args:
+            query (str): The mistyped student id or name.
+
+        Returns:
+            tuple[list[int], list[int]]: The rows of the similar ids and of the similar names.
+        """
+        with self.profiler.phase('fuzzy'):
+            similar_id = self.index.similar_ids(query, max_distance=3)
+            similar_name = self.index.similar_names(query)
+        return [row for _, row in similar_id], [row for _, row in similar_name]
+
+    def group_members(self, group: str) -> list[int]:
+        """Find the members of a group.
+
+        Args:
+            group (str): The group, e.g. '7' or '第7組'.
+
+        Returns:
+            list[int]: The row positions.
+        """
+        with self.profiler.phase('lookup'):
+            return np.flatnonzero(
+                (self.target['組別'].astype(str) == group_code(group)).to_numpy()).tolist()
+
+    def value_of(self, value):
+        """The value written to the book for a mark or a score.
+
+        Args:
+            value: The mark, one of :data:`MARKS`, or the score in mode 'group'.
+
+        Raises:
+            ValueError: If the mark is not in :data:`MARKS` or the score is not a number.
+
+        Returns:
+            str | float: The mark or the score.
+        """
+        if self.mode == 'group':
+            return float(value)
+        value = str(value)
+        if value not in MARKS:
+            raise ValueError(f"mark '{value}' is not one of {MARKS}")
+        return value
+
+    def _write(self, entries: list[tuple[int, object]], columns: Optional[list[str]] = None):
+        if columns is None:
+            columns = self.titles
+        missing = [col for col in columns if col not in self.target.columns]
+        if len(missing) > 0:
+            raise KeyError(f"columns {missing} not found")
+        records = []
+        cells: dict[str, dict[int, object]] = {col: {} for col in columns}
+        with self.profiler.phase('assign'):
+            for row, values in entries:
+                if not isinstance(values, (list, tuple)):
+                    values = [values]
+                if len(values) != len(columns):
+                    raise ValueError(f"{len(values)} values for the columns {columns}")
+                for col, value in zip(columns, values):
+                    value = self.value_of(value)
+                    cells[col][row] = value
+                    records.append((self.index.ids[row], col, value))
+            for col, col_cells in cells.items():
+                set_cells(self.target, col_cells, col)
+        with self.profiler.phase('journal'):
+            self.journal.extend(records)
+        if self.journal.due():
+            with self.profiler.phase('save'):
+                self.journal.fold(self.target)
+
+    def assign(self, student, values, columns: Optional[list[str]] = None) -> int:
+        """Write the mark or the scores of one student to the selected columns.
+
+        Args:
+            student (int | str): The row position or the student id.
+            values: The mark, e.g. '1' or '假', or the list of scores in mode 'group'.
+            columns (Optional[list[str]], optional): The columns to write instead of
+                the selected ones, they must exist already.
+
+        Raises:
+            KeyError: If the student id or a column is not found.
+            ValueError: If the number of values does not match the columns, or a
+                value is not a mark of :data:`MARKS` out of mode 'group'.
+
+        Returns:
+            int: The row position of the student.
+        """
+        row = self.row_of(student)
+        self._write([(row, values)], columns)
+        return row
+
+    def assign_many(self, entries: Iterable[tuple[object, object]]) -> list[tuple[object, object]]:
+        """Write the marks or scores of many students, recorded in the journal at once.
+
+        Args:
+            entries (Iterable[tuple[object, object]]): The (student, values) pairs,
+                as taken by :meth:`assign`.
+
+        Raises:
+            ValueError: If the number of values does not match the columns, or a
+                value is not a mark of :data:`MARKS` out of mode 'group'.
+
+        Returns:
+            list[tuple[object, object]]: The entries whose student is not found.
+        """
+        found, missing = [], []
+        for student, values in entries:
+            try:
+                found.append((self.row_of(student), values))
+            except KeyError:
+                missing.append((student, values))
+        if len(found) > 0:
+            self._write(found)
+        return missing
+
+    def assign_groups(self, scores: pd.DataFrame) -> tuple[int, list[str]]:
+        """Write the scores of every member of the groups, see :func:`score_groups`.
+
+        Args:
+            scores (pd.DataFrame): The scores of each group in the selected columns,
+                indexed by group code.
+
+        Returns:
+            tuple[int, list[str]]: The number of students scored and the groups without member.
+        """
+        with self.profiler.phase('assign'):
+            self.target, entries, empty_groups = score_groups(self.target, self.titles, scores)
+        with self.profiler.phase('journal'):
+            self.journal.extend(entries)
+        if self.journal.due():
+            with self.profiler.phase('save'):
+                self.journal.fold(self.target)
+        return len(entries) // len(self.titles), empty_groups
+
+    def take_error(self) -> Optional[Exception]:
+        """The error of the last background write of the excel file, once.
+
+        Returns:
+            Optional[Exception]: The error, None if there is none to report.
+        """
+        return self.journal.take_error()
+
+    def flush(self) -> Optional[Exception]:
+        """Fold the journal into the book now.
+
+        Returns:
+            Optional[Exception]: The error of the last background write, if any.
+        """
+        with self.profiler.phase('save'):
+            self.journal.fold(self.target)
+        return self.journal.take_error()
+
+    def close(self) -> Optional[Exception]:
+        """Fold the journal into the book and close it.
+
+        Returns:
+            Optional[Exception]: The error if the last write failed.
+        """
+        with self.profiler.phase('save'):
+            return self.journal.close(self.target)
+
+
+def handle_input(
+    target: pd.DataFrame,
+    mode: Literal['attend', 'test', 'hw', "group"],
+    target_path: str,
+    reserved_col: Optional[list[str]] = None,
+    title_parse: re.Pattern = re.compile('[a-zA-Z0-9_-_._/]+'),
+    input_parse: re.Pattern = re.compile('[a-zA-Z0-9_-_.]+'),
+    journal: Optional[CheckinJournal] = None,
+    index: Optional[RosterIndex] = None,
+    profiler: Optional[PhaseProfiler] = None,
+    live: bool = False,
+):
+    """Handle the input from user, the terminal front end of :class:`RollcallSession`.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        target_path (str): The path of the target file.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
+        title_parse (re.Pattern, optional): The pattern of the title.
+        input_parse (re.Pattern, optional): The pattern of the input.
+        journal (Optional[CheckinJournal], optional): The journal recording the assignments.
+            If not given, a journal is opened and folded when the input ends.
+        index (Optional[RosterIndex], optional): The lookup index of the roster.
+            If not given, it is built from the target.
+        profiler (Optional[PhaseProfiler], optional): The timing of each phase of the entries.
+        live (bool, optional): Search the students as the query is typed, see
+            :func:`live_search`. Needs a terminal.
+    """
+
+    if reserved_col is None:
+        reserved_col = RESERVED_COL
+    if profiler is None:
+        profiler = PhaseProfiler(enabled=False)
+    own_journal = journal is None
+    session = RollcallSession(
+        target, mode, target_path,
+        journal=journal, index=index, reserved_col=reserved_col, profiler=profiler)
+    index = session.index
+    if not isinstance(title_parse, re.Pattern):
+        raise TypeError(
+            f"'title_parse' should be re.Pattern. not '{type(title_parse)}'.")
+    if not isinstance(input_parse, re.Pattern):
+        raise TypeError(
+            f"'input_parse' should be re.Pattern. not '{type(input_parse)}'.")
+
+    titles: list[str] = []
+    colunm_not_decide = True
+    while colunm_not_decide:
+        hint_for_group = ' (multiple title divided by \',\')' if mode == 'group' else ''
+        raw_col = input(
+            Fore.BLUE + "| 輸入欲修改的欄位: "+hint_for_group+"\n>>> "+Style.RESET_ALL)
+        if raw_col == '':
+            continue
+        titles_raw = raw_col.split(',')
+        titles_raw = [s.strip() for s in titles_raw]
+        titles_raw = [title_parse.findall(s)[0] for s in titles_raw]
+        print(titles_raw)
+
+        if mode == 'group':
+            is_confirmed = input(
+                Fore.YELLOW + f"| Check the following column: \n{titles_raw}\n" +
+                Style.RESET_ALL+Fore.BLUE+"| ENTER to yes, 'n' for no to reset" +
+                "\n>>> "+Style.RESET_ALL)
+            colunm_not_decide = is_confirmed == 'n'
+            if not is_confirmed in ['', 'n']:
+                print(
+                    Fore.RED + Style.BRIGHT +
+                    "| Input error. Reset the title." + Style.RESET_ALL
+                )
+                colunm_not_decide = True
+            if colunm_not_decide:
+                print(Fore.YELLOW + "| Title reset." + Style.RESET_ALL)
+        else:
+            if len(titles_raw) == 1:
+                colunm_not_decide = False
+            else:
+                print(
+                    Fore.RED + Style.BRIGHT +
+                    "| Only mode 'group' allow multiple title." + Style.RESET_ALL
+                )
+                continue
+
+        titles = [t for t in titles_raw if t in target.columns or ask_new_column(t)]
+
+        if len(titles) == 0:
+            colunm_not_decide = True
+            print(
+                Fore.RED + Style.BRIGHT +
+                "| No title selected. Reset the title." + Style.RESET_ALL
+            )
+
+    titles = session.select_columns(titles)
+    target = session.target
+
+    running = True
+    while running:
+
+        save_error = session.take_error()
+        if save_error is not None:
+            print(
+                Fore.RED + Style.BRIGHT +
+                f"| Cannot save '{target_path}': {save_error}\n" +
+                "| The entries are kept in the journal and saved again with the next ones." +
+                Style.RESET_ALL)
+
+        picked, check = None, ''
+        if live:
+            print(
+                Fore.YELLOW +
+                "| Type the student id or name, TAB or UP/DOWN to choose, ENTER to confirm" +
+                (", '/' for day-off.\n" if mode != 'group' else ".\n") +
+                (f"| Input '{GROUP_PREFIX}<group>' to score a whole group, '{GROUP_PREFIX}' to paste a matrix.\n"
+                 if mode == 'group' else '') +
+                "| Input '0' or 'end' to stop." + Style.RESET_ALL
+            )
+            with key_mode():
+                student, picked, check = live_search(target, mode, titles, index, profiler=profiler)
+        else:
+            student = ask_student(mode)
+        row = -1
+
+        exit_sign = student in ['0', 'end']
+        if exit_sign:
+            print('| exit')
+            running = False
+            continue
+        if len(student) == 0:
+            continue
+
+        if mode == 'group' and student.startswith(GROUP_PREFIX):
+            group = student[len(GROUP_PREFIX):].strip()
+            if len(group) > 0:
+                members = target.iloc[session.group_members(group)]
+                if len(members) == 0:
+                    print(
+                        Fore.RED + Style.BRIGHT +
+                        f"| No member in group '{group}'." + Style.RESET_ALL)
+                    continue
+                with profiler.phase('print'):
+                    shown = str(members[list(reserved_col)+titles])
+                check = input(
+                    Fore.YELLOW +
+                    f"| Does group '{group}' match: \n{shown}" +
+                    Style.RESET_ALL+Fore.BLUE +
+                    f"\n| Enter score for '{titles}' of every member, divided by ','" +
+                    "\n| 'n' for no assign. " +
+                    "\n>>> "+Style.RESET_ALL
+                )
+                if check == 'n':
+                    continue
+                matrix_lines = [f"{group},{check}"]
+            else:
+                print(
+                    Fore.YELLOW +
+                    f"| Paste the rows 'group,score,...' for '{titles}', one group per line," +
+                    "\n| divided by tab or ','. A first row naming the columns is allowed." +
+                    "\n| Empty line to end." + Style.RESET_ALL)
+                matrix_lines = list(iter(input, ''))
+
+            scores, rejects = parse_group_matrix(matrix_lines, titles)
+            for _, raw, reason in rejects:
+                print(
+                    Fore.RED + Style.BRIGHT +
+                    f"| Score not added, {reason}:\n    {raw}" + Style.RESET_ALL)
+            if len(scores) == 0:
+                continue
+            if len(group) == 0:
+                is_confirmed = input(
+                    Fore.YELLOW + f"| Scores by group: \n{scores}\n" +
+                    Style.RESET_ALL+Fore.BLUE+"| ENTER to yes, 'n' for no assign" +
+                    "\n>>> "+Style.RESET_ALL)
+                if is_confirmed != '':
+                    continue
+
+            scored, empty_groups = session.assign_groups(scores)
+            target = session.target
+            for g in empty_groups:
+                print(
+                    Fore.RED + Style.BRIGHT +
+                    f"| No member in group '{g}'." + Style.RESET_ALL)
+            print(f"| Score added to {scored} students.")
+            with profiler.phase('print'):
+                print(target[target['組別'].astype(str).isin(scores.index)][list(reserved_col)+titles])
+            continue
+
+        if picked is not None:
+            matched_by, rows = 'live', [picked]
+        else:
+            matched_by, rows = session.lookup(student)
+        chech_hint = check_hint(mode, titles)
+
+        if matched_by in ('id', 'name'):
+            with profiler.phase('print'):
+                shown = str(target.iloc[rows])
+        if matched_by == 'live':
+            row = rows[0]
+            if mode == 'group':
+                check = input(
+                    Fore.BLUE + chech_hint.lstrip('\n') + "\n>>> " + Style.RESET_ALL)
+        elif matched_by in ('id', 'name'):
+            check = ask_match(matched_by, student, shown, chech_hint)
+            row = rows[0]
+        else:
+            print_not_found(student)
+            similar_id, similar_name = session.similar(student)
+            with profiler.phase('print'):
+                if len(similar_id) > 0:
+                    print("| Similar id:\n", target.iloc[similar_id])
+                if len(similar_name) > 0:
+                    print("| Similar name:\n", target.iloc[similar_name])
+            continue
+
+        if check == 'n':
+            continue
+
+        if mode == 'group':
+            scores = read_scores(check, titles, input_parse)
+            if scores is not None:
+                session.assign(row, scores)
+                print("| Score added.")
+                with profiler.phase('print'):
+                    print(target.iloc[[row]][list(reserved_col)+titles])
+
+        else:
+            mark = CHECK_MARKS.get(check)
+            if mark is not None:
+                session.assign(row, mark)
+            else:
+                print(Fore.RED+Style.BRIGHT +
+                      f'| No assign for {student}'+Style.RESET_ALL)
+            with profiler.phase('print'):
+                print(target.iloc[[row]][list(reserved_col)+titles])
+
+    if own_journal:
+        save_error = session.close()
+        if save_error is not None:
+            print(
+                Fore.RED + Style.BRIGHT +
+                f"| Cannot save '{target_path}': {save_error}\n" +
+                "| The entries are kept in the journal and replayed on the next start." +
+                Style.RESET_ALL)
+
+
+def bulk_ingest(
+    target: pd.DataFrame,
+    mode: Literal['attend', 'test', 'hw', "group"],
+    titles: list[str],
+    lines: Iterable[str],
+    index: Optional[RosterIndex] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Apply a batch of check-ins without prompting.
+
+    Each line is a student id, optionally followed by ',l' for day-off in
+    mode 'attend' and 'hw', or ``id,score,...`` with one score per title
+    in mode 'group'. The batch is joined against the roster in one pass
+    and each title is written with a single column assignment.
+
+    Unknown ids, ids appearing more than once in the roster, ids given
+    conflicting values in the batch and malformed lines are rejected.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        titles (list[str]): The columns to be written.
+        lines (Iterable[str]): The input lines.
+        index (Optional[RosterIndex], optional): The lookup index of the roster.
+            If not given, it is built from the target.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]:
+            The dataframe of the target file and the rejected lines
+            with columns 'line', 'input' and 'reason'.
+    """
+    if index is None:
+        index = RosterIndex(target)
+    mark_of = {'': '1', '1': '1', '0': '0', 'l': '假', '假': '假'}
+
+    records, rejects = [], []
+    for line_no, line in enumerate(lines, start=1):
+        raw = line.strip()
+        if len(raw) == 0:
+            continue
+        fields = [f.strip() for f in raw.split(',')]
+        if mode == 'group':
+            if len(fields) != len(titles) + 1:
+                rejects.append((line_no, raw, f'expect {len(titles)} scores'))
+                continue
+            records.append([line_no, raw] + fields)
+        else:
+            if len(fields) > 2 or (fields + [''])[1] not in mark_of:
+                rejects.append((line_no, raw, 'unrecognized mark'))
+                continue
+            records.append([line_no, raw, fields[0], mark_of[(fields + [''])[1]]])
+
+    value_cols = titles if mode == 'group' else titles[:1]
+    batch = pd.DataFrame(records, columns=['line', 'input', '學號'] + value_cols)
+    batch['學號'] = fold_width(batch['學號']).str.strip()
+    reason = pd.Series('', index=batch.index, dtype=object)
+
+    if mode == 'group':
+        for col in value_cols:
+            batch[col] = pd.to_numeric(batch[col], errors='coerce')
+        reason[batch[value_cols].isna().any(axis=1)] = 'score is not numeric'
+
+    roster_ids = pd.Series(index.ids)
+    duplicated_ids = set(roster_ids[roster_ids.duplicated()])
+    batch['row'] = batch['學號'].map(index.id_to_row)
+    reason[(reason == '') & batch['學號'].isin(duplicated_ids)] = 'ambiguous id in roster'
+    reason[(reason == '') & batch['row'].isna()] = 'id not found'
+
+    valid = batch[reason == '']
+    conflicted = valid.groupby('學號')[value_cols].nunique().gt(1).any(axis=1)
+    conflicted_ids = set(conflicted[conflicted].index)
+    reason[(reason == '') & batch['學號'].isin(conflicted_ids)] = 'conflicting values'
+
+    valid = batch[reason == ''].drop_duplicates('學號', keep='last')
+    rows = valid['row'].astype(int).to_numpy()
+    for col in value_cols:
+        target = prepare_col(target, col, mode)
+        if mode == 'group':
+            values = target[col].to_numpy(copy=True)
+            values[rows] = valid[col].to_numpy()
+            target[col] = values
+        else:
+            categories = target[col].cat.categories
+            codes = target[col].cat.codes.to_numpy(copy=True)
+            codes[rows] = categories.get_indexer(valid[col])
+            target[col] = pd.Categorical.from_codes(codes, categories=categories)
+
+    rejected = batch.loc[reason != '', ['line', 'input']].assign(reason=reason[reason != ''])
+    rejected = pd.concat([
+        pd.DataFrame(rejects, columns=['line', 'input', 'reason']),
+        rejected,
+    ]).sort_values('line', ignore_index=True)
+
+    return target, rejected
+
+
+def kiosk_secret(key_path: str) -> bytes:
+    """The secret signing the codes of the check-in sessions.
+
+    It is made the first time and kept in the key file, readable only by
+    its owner, so a kiosk restarted during the class shows the same code.
+
+    Args:
+        key_path (str): The path of the key file, '<excel file>.kiosk.key'.
+
+    Returns:
+        bytes: The secret.
+    """
+    if os.path.isfile(key_path):
+        with open(key_path, 'rb') as f:
+            return f.read()
+    secret = os.urandom(32)
+    fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secret)
+    return secret
+
+
+def session_code(secret: bytes, session: str, digits: int = 6) -> str:
+    """The short code of a check-in session, the HMAC of its name.
+
+    Args:
+        secret (bytes): The secret of :func:`kiosk_secret`.
+        session (str): The name of the session, e.g. 'course/attend/1011'.
+        digits (int, optional): The length of the code.
+
+    Returns:
+        str: The code in decimal digits.
+    """
+    digest = hmac.new(secret, session.encode('utf-8'), hashlib.sha256).digest()
+    return f"{int.from_bytes(digest[:8], 'big') % 10 ** digits:0{digits}d}"
+
+
+class KioskSession:
+    """Self check-in of the students into one column of mode 'attend'.
+
+    A check-in is validated in memory against the roster index and the
+    session code, and only queued. The queue is written through
+    :meth:`RollcallSession.assign_many` in one batch every `batch_size`
+    check-ins or `batch_seconds` seconds by a background thread, so a
+    burst of students waits for no fsync. A batch that cannot be written
+    stays queued and its error is handed out by :meth:`take_error`, so
+    the writer keeps running. After `max_failures` wrong codes a student
+    id has to be checked in by the TA.
+
+    Args:
+        rollcall (RollcallSession): The session of mode 'attend', with the column selected.
+        secret (bytes): The secret of :func:`kiosk_secret`.
+        session_name (str, optional): The name of the session signed by the code.
+            The column by default.
+        batch_size (int, optional): The check-ins written at once.
+        batch_seconds (float, optional): The longest wait of a check-in before it is written.
+        max_failures (int, optional): The wrong codes allowed for a student id.
+    """
+
+    def __init__(
+        self,
+        rollcall: RollcallSession,
+        secret: bytes,
+        session_name: str = '',
+        batch_size: int = 50,
+        batch_seconds: float = 2.0,
+        max_failures: int = 5,
+    ):
+        self.rollcall = rollcall
+        self.title = rollcall.titles[0]
+        self.index = rollcall.index
+        self.code = session_code(secret, session_name or self.title)
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.max_failures = max_failures
+        self.checked: set[int] = set(
+            np.flatnonzero((rollcall.target[self.title] == '1').to_numpy()).tolist())
+        self.failures: dict[int, int] = {}
+        self.pending: list[int] = []
+        self._oldest = 0.0
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check_in(self, student_id: str, code: str) -> tuple[bool, str]:
+        """Validate and queue the check-in of a student.
+
+        Args:
+            student_id (str): The student id as typed.
+            code (str): The session code as typed.
+
+        Returns:
+            tuple[bool, str]: Whether the student is checked in and the message to show.
+        """
+        row = self.index.row_of(unicodedata.normalize('NFKC', student_id).strip())
+        if row is None:
+            return False, f"學號 '{student_id}' not found"
+        code = unicodedata.normalize('NFKC', code).strip()
+        with self._lock:
+            if self.failures.get(row, 0) >= self.max_failures:
+                return False, 'Too many wrong codes, please ask the TA'
+            if not hmac.compare_digest(code, self.code):
+                self.failures[row] = self.failures.get(row, 0) + 1
+                return False, 'Wrong code'
+            name = self.index.names[row]
+            if row in self.checked:
+                return True, f"{name} is already checked in"
+            self.checked.add(row)
+            if len(self.pending) == 0:
+                self._oldest = time.monotonic()
+            self.pending.append(row)
+        return True, f"{name} checked in"
+
+    def flush(self, force: bool = False) -> int:
+        """Write the queued check-ins if the batch is full or old enough.
+
+        Args:
+            force (bool, optional): Write whatever is queued.
+
+        Returns:
+            int: The number of check-ins written.
+        """
+        with self._write_lock:
+            with self._lock:
+                due = len(self.pending) >= self.batch_size or (
+                    len(self.pending) > 0 and
+                    time.monotonic() - self._oldest >= self.batch_seconds)
+                if not (due or force):
+                    return 0
+                rows = list(self.pending)
+            # the rows leave the queue only once written, a failed batch is retried
+            self.rollcall.assign_many((row, '1') for row in rows)
+            with self._lock:
+                del self.pending[:len(rows)]
+            return len(rows)
+
+    def take_error(self) -> Optional[Exception]:
+        """The error of the last batch or background write, once.
+
+        Returns:
+            Optional[Exception]: The error, None if there is none to report.
+        """
+        with self._lock:
+            error, self._error = self._error, None
+        return error if error is not None else self.rollcall.take_error()
+
+    def _run(self):
+        while not self._stop.wait(min(self.batch_seconds, 0.5)):
+            try:
+                self.flush()
+            except Exception as error:  # pylint: disable=broad-except
+                with self._lock:
+                    self._error = error
+
+    def start(self):
+        """Start writing the batches in the background."""
+        self._thread = threading.Thread(target=self._run, name='kiosk-writer', daemon=True)
+        self._thread.start()
+
+    def close(self) -> int:
+        """Stop the background writer and write the rest of the queue.
+
+        Returns:
+            int: The number of check-ins written, the rest stays in :attr:`pending`.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            return self.flush(force=True)
+        except Exception as error:  # pylint: disable=broad-except
+            with self._lock:
+                self._error = error
+            return 0
+
+
+def print_kiosk_error(kiosk: KioskSession):
+    """Print the error of the last write of the kiosk, if any.
+
+    Args:
+        kiosk (KioskSession): The check-in session.
+    """
+    error = kiosk.take_error()
+    if error is not None:
+        print(
+            Fore.RED + Style.BRIGHT +
+            f"| Cannot save the check-ins: {error}\n" +
+            "| They are kept and saved again with the next ones." + Style.RESET_ALL)
+
+
+KIOSK_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Check-in {title}</title></head>
+<body style="font-family: sans-serif; font-size: 2em; text-align: center">
+<p style="color: {color}">{message}</p>
+<form method="post" action="/">
+<p>學號 <input name="id" autofocus autocomplete="off"></p>
+<p>代碼 <input name="code" inputmode="numeric" autocomplete="off"></p>
+<p><button type="submit">Check in</button></p>
+</form></body></html>
+"""
+
+
+def serve_kiosk(kiosk: KioskSession, port: int = 8000, host: str = '127.0.0.1'):
+    """Serve the check-in form of the kiosk until Ctrl-C.
+
+    Args:
+        kiosk (KioskSession): The check-in session.
+        port (int, optional): The port of the form.
+        host (str, optional): The address to listen on, only this computer by default.
+    """
+
+    class KioskHandler(http.server.BaseHTTPRequestHandler):
+
+        def _page(self, message: str = '', ok: bool = True):
+            body = KIOSK_PAGE.format(
+                title=html.escape(kiosk.title), message=html.escape(message),
+                color='green' if ok else 'red').encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._page()
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            form = urllib.parse.parse_qs(self.rfile.read(length).decode('utf-8'))
+            ok, message = kiosk.check_in(form.get('id', [''])[0], form.get('code', [''])[0])
+            print((Fore.GREEN if ok else Fore.RED) + f"| {message}" + Style.RESET_ALL)
+            print_kiosk_error(kiosk)
+            self._page(message, ok)
+
+        def log_message(self, format, *args):
+            pass
+
+    class KioskServer(http.server.ThreadingHTTPServer):
+        request_queue_size = 128
+        daemon_threads = True
+
+    server = KioskServer((host, port), KioskHandler)
+    print(Fore.BLUE + Style.BRIGHT + f"| Check-in form on http://{host}:{port}/" + Style.RESET_ALL)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def run_kiosk(kiosk: KioskSession):
+    """Take the check-ins at this terminal until Ctrl-C.
+
+    A line is '學號 代碼', or the 學號 alone followed by the code at the
+    next prompt.
+
+    Args:
+        kiosk (KioskSession): The check-in session.
+    """
+    while True:
+        fields = input(Fore.BLUE + "| 學號 代碼: " + Style.RESET_ALL).split()
+        if len(fields) == 0:
+            continue
+        if len(fields) == 1:
+            fields.append(input(Fore.BLUE + "| 代碼: " + Style.RESET_ALL))
+        ok, message = kiosk.check_in(fields[0], fields[1])
+        print((Fore.GREEN if ok else Fore.RED + Style.BRIGHT) + f"| {message}" + Style.RESET_ALL)
+        print_kiosk_error(kiosk)
+
+
+def group_code(text: str) -> str:
+    """The code of a group as kept in 組別 by :func:`normalize_roster`.
+
+    Args:
+        text (str): The group, e.g. '7' or '第7組'.
+
+    Returns:
+        str: The code, '' if there is none.
+    """
+    found = re.findall('[a-zA-Z0-9]+', str(text))
+    return found[0] if len(found) > 0 else ''
+
+
+def parse_group_matrix(
+    lines: Iterable[str],
+    titles: list[str],
+) -> tuple[pd.DataFrame, list[tuple[int, str, str]]]:
+    """Parse a group x criteria matrix, e.g. pasted from a spreadsheet.
+
+    Each line is a group followed by one score per title, separated by
+    tabs or ','. If the scores of the first line are not numeric, it is
+    a header naming the columns: the titles are taken by name and the
+    other columns are ignored. A group given different scores on several
+    lines is rejected.
+
+    Args:
+        lines (Iterable[str]): The lines of the matrix.
+        titles (list[str]): The columns to be written.
+
+    Returns:
+        tuple[pd.DataFrame, list[tuple[int, str, str]]]:
+            The scores indexed by group code with the titles as columns,
+            and the rejected (line, input, reason).
+    """
+    rows = [
+        (line_no, line.strip(), [f.strip() for f in re.split('[\t,]', line.strip())])
+        for line_no, line in enumerate(lines, start=1) if len(line.strip()) > 0
+    ]
+    positions = list(range(1, len(titles) + 1))
+    rejects: list[tuple[int, str, str]] = []
+    if len(rows) > 0 and pd.to_numeric(pd.Series(rows[0][2][1:]), errors='coerce').isna().any():
+        line_no, raw, header = rows.pop(0)
+        missing = [t for t in titles if t not in header[1:]]
+        if len(missing) > 0:
+            return pd.DataFrame(columns=titles, dtype=float), [
+                (line_no, raw, f'header without {missing}')]
+        positions = [header.index(t, 1) for t in titles]
+
+    records = []
+    for line_no, raw, fields in rows:
+        if len(fields) <= max(positions) or group_code(fields[0]) == '':
+            rejects.append((line_no, raw, f'expect a group and {len(titles)} scores'))
+            continue
+        records.append([line_no, raw, group_code(fields[0])] + [fields[i] for i in positions])
+
+    batch = pd.DataFrame(records, columns=['line', 'input', 'group'] + titles)
+    for col in titles:
+        batch[col] = pd.to_numeric(batch[col], errors='coerce')
+    reason = pd.Series('', index=batch.index, dtype=object)
+    reason[batch[titles].isna().any(axis=1)] = 'score is not numeric'
+    conflicted = batch[reason == ''].groupby('group')[titles].nunique().gt(1).any(axis=1)
+    reason[(reason == '') & batch['group'].isin(conflicted[conflicted].index)] = 'conflicting scores'
+
+    rejected = reason != ''
+    rejects += list(zip(batch.loc[rejected, 'line'], batch.loc[rejected, 'input'], reason[rejected]))
+    scores = batch[reason == ''].drop_duplicates('group', keep='last').set_index('group')[titles]
+    return scores, sorted(rejects)
+
+
+def score_groups(
+    target: pd.DataFrame,
+    titles: list[str],
+    scores: pd.DataFrame,
+) -> tuple[pd.DataFrame, list[tuple[str, str, float]], list[str]]:
+    """Give every member of the groups the scores of their group.
+
+    Each title is written with a single column assignment, joining 組別
+    against the group codes of the scores.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file, with 組別 normalized.
+        titles (list[str]): The columns to be written.
+        scores (pd.DataFrame): The scores indexed by group code with the titles as columns.
+
+    Returns:
+        tuple[pd.DataFrame, list[tuple[str, str, float]], list[str]]:
+            The dataframe of the target file, the (student id, column, score)
+            written, and the groups without any member.
+    """
+    codes = target['組別'].astype(str)
+    rows = np.flatnonzero(codes.isin(scores.index).to_numpy())
+    ids = target['學號'].astype(str).to_numpy()[rows]
+    entries = []
+    for col in titles:
+        values = target[col].to_numpy(dtype=float, copy=True)
+        values[rows] = codes.iloc[rows].map(scores[col]).to_numpy(dtype=float)
+        target[col] = values
+        entries += [(student_id, col, float(v)) for student_id, v in zip(ids, values[rows])]
+    present = set(codes)
+    return target, entries, [g for g in scores.index if g not in present]
+
+
+def fold_names(names: pd.Series) -> pd.Series:
+    """Normalize names for matching: fold the width and drop whitespace.
+
+    Args:
+        names (pd.Series): The names.
+
+    Returns:
+        pd.Series: The normalized names.
+    """
+    return fold_width(names).str.replace(r'\s+', '', regex=True)
+
+
+def name_keys(names: pd.Series) -> pd.Series:
+    """The key matching a name of the roster with a name of the groups.
+
+    The registrar writes 姓名 as the Chinese name followed by its
+    romanization, e.g. '劉芷妤LIOU,ZHI-YU', while the groups only list
+    '劉芷妤', so the key is the leading run of CJK characters of the
+    normalized name, or the whole normalized name if it has none.
+
+    Args:
+        names (pd.Series): The names.
+
+    Returns:
+        pd.Series: The keys.
+    """
+    folded = fold_names(names)
+    return folded.str.extract(f"({CJK_RUN.pattern})", expand=False).fillna(folded)
+
+
+def assign_groups(
+    target: pd.DataFrame,
+    groups: dict[str, list[str]],
+) -> tuple[pd.DataFrame, dict[str, list]]:
+    """Fill 組別 from the members of each group.
+
+    The names of the roster and of the groups are reduced to their key by
+    :func:`name_keys` once, and 組別 is filled with a single dictionary
+    join on the key, so a name only matches the same name and never a
+    longer one containing it. The groups are written as their
+    :func:`group_code`, so '1' and '第1組' are the same group. A name
+    shared by several students is not assigned, and students not in any
+    group keep their 組別.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        groups (dict[str, list[str]]): The names of the members by group,
+            as in the group json file.
+
+    Returns:
+        tuple[pd.DataFrame, dict[str, list]]:
+            The dataframe of the target file and the problems found:
+            'unmatched' names not in the roster, 'duplicated' names put in
+            several groups as (name, groups), and 'ambiguous' names shared
+            by several students of the roster, which are left unassigned.
+    """
+    member_names = [
+        (group_code(g) or str(g).strip(), name) for g, members in groups.items() for name in members]
+    keys = name_keys(pd.Series([name for _, name in member_names], dtype=object))
+
+    group_of: dict[str, str] = {}
+    groups_of: dict[str, list[str]] = {}
+    for (group, _), key in zip(member_names, keys):
+        group_of[key] = group
+        groups_of.setdefault(key, []).append(group)
+
+    roster_keys = name_keys(target['姓名'])
+    roster_set = set(roster_keys)
+    shared = set(roster_keys[roster_keys.duplicated(keep=False)])
+
+    assigned = roster_keys.map({k: g for k, g in group_of.items() if k not in shared})
+    target['組別'] = assigned.fillna(target['組別'].astype(str))
+
+    return target, {
+        'unmatched': [key for key in group_of if key not in roster_set],
+        'duplicated': [(key, g) for key, g in groups_of.items() if len(set(g)) > 1],
+        'ambiguous': sorted(shared & set(group_of)),
+    }
+
+
+def registrar_rows(
+    sheet,
+    columns: Optional[list[str]] = None,
+    header_search: int = 30,
+) -> Iterable[list]:
+    """Stream the students of a sheet of the registrar export.
+
+    The header row is the first of the first ``header_search`` rows
+    holding every wanted column, the rows above it (course, teacher,
+    print date, ...) are skipped. Only the cells up to the last wanted
+    column are read, and rows whose 學號 is not alphanumeric, like the
+    footer or a header repeated on every page, are skipped.
+
+    Args:
+        sheet: The openpyxl worksheet, opened read-only.
+        columns (Optional[list[str]], optional): The wanted columns.
+            Defaults to '序號', '系級', '學號' and '姓名'.
+        header_search (int, optional): The number of rows searched for the header.
+
+    Returns:
+        Iterable[list]: The values of the wanted columns of each student.
+            Nothing if the header is not found.
+    """
+    if columns is None:
+        columns = ['序號', '系級', '學號', '姓名']
+    header_row, positions = 0, None
+    for header_row, row in enumerate(
+        sheet.iter_rows(max_row=header_search, values_only=True), start=1
+    ):
+        header = [str(v).strip() if v is not None else '' for v in row]
+        if all(col in header for col in columns):
+            positions = [header.index(col) for col in columns]
+            break
+    if positions is None:
+        return
+
+    width = max(positions) + 1
+    student_id_at = positions[columns.index('學號')] if '學號' in columns else None
+    for row in sheet.iter_rows(min_row=header_row + 1, max_col=width, values_only=True):
+        row = list(row) + [None] * (width - len(row))
+        if student_id_at is not None and STUDENT_ID.fullmatch(
+            unicodedata.normalize('NFKC', str(row[student_id_at] or '')).strip()
+        ) is None:
+            continue
+        yield [row[i].strip() if isinstance(row[i], str) else row[i] for i in positions]
+
+
+def import_roster(
+    export_path: str,
+    out_dir: str = '.',
+    modes: Optional[list[str]] = None,
+    supported_file: str = './ta_support_files.json',
+) -> dict[str, dict[str, str]]:
+    """Make the workbooks of every course of a registrar export.
+
+    The export is read sheet by sheet and row by row, and each student
+    is written straight to the workbooks of every mode, so the memory
+    used does not grow with the size of the export. Each sheet with a
+    header becomes a course named after the sheet, or the 'default'
+    course if there is only one. The files are added to
+    'ta_support_files.json', replacing the courses of the same name.
+
+    Args:
+        export_path (str): The path of the registrar export.
+        out_dir (str, optional): The folder of the workbooks.
+        modes (Optional[list[str]], optional): The modes to make workbooks for.
+            Defaults to 'attend', 'hw', 'group' and 'test'.
+        supported_file (str, optional): The file location of the supported files.
+
+    Raises:
+        FileExistsError: If a workbook to be made already exists.
+
+    Returns:
+        dict[str, dict[str, str]]: The file location of the workbooks by course then mode.
+    """
+    if modes is None:
+        modes = ['attend', 'hw', 'group', 'test']
+    export = openpyxl.load_workbook(export_path, read_only=True, data_only=True)
+    stem = os.path.splitext(os.path.basename(export_path))[0]
+    courses: dict[str, dict[str, str]] = {}
+    for title in export.sheetnames:
+        if len(export.sheetnames) == 1:
+            course, prefix = DEFAULT_COURSE, stem
+        else:
+            course, prefix = title, stem + '_' + re.sub(r'[\\/:*?"<>|\s]+', '_', title)
+        courses[course] = {
+            mode: os.path.join(out_dir, f"{prefix}_{mode}.xlsx") for mode in modes}
+    existing = [path for locations in courses.values() for path in locations.values() if os.path.isfile(path)]
+    if len(existing) > 0:
+        export.close()
+        raise FileExistsError(f"{existing} already exist.")
+
+    header = ['序號', '組別', '系級', '學號', '姓名']
+    imported: dict[str, dict[str, str]] = {}
+    for sheet, (course, locations) in zip(export.worksheets, courses.items()):
+        students = registrar_rows(sheet)
+        first = next(students, None)
+        if first is None:
+            print(Fore.YELLOW + f"| No student found in sheet '{sheet.title}'" + Style.RESET_ALL)
+            continue
+        books = {mode: openpyxl.Workbook(write_only=True) for mode in modes}
+        sheets = {mode: book.create_sheet() for mode, book in books.items()}
+        for out in sheets.values():
+            out.append(header)
+        count = 0
+        for serial, grade, student_id, name in itertools.chain([first], students):
+            for out in sheets.values():
+                out.append([serial, None, grade, student_id, name])
+            count += 1
+        for mode, book in books.items():
+            book.save(locations[mode])
+        imported[course] = locations
+        print(f"| Imported {count} students of '{sheet.title}'")
+    export.close()
+
+    if len(imported) == 0:
+        return imported
+    known = {}
+    if os.path.isfile(supported_file):
+        with open(supported_file, encoding='utf-8') as f:
+            known = course_locations(json.load(f))
+    known.update(imported)
+    with open(supported_file, 'w', encoding='utf-8') as f:
+        json.dump(
+            known if list(known) != [DEFAULT_COURSE] else known[DEFAULT_COURSE],
+            f, ensure_ascii=False, indent=2)
+    return imported
+
+
+def session_columns(
+    target: pd.DataFrame,
+    mode: Literal['attend', 'test', 'hw', "group"],
+    reserved_col: Optional[list[str]] = None,
+) -> list[str]:
+    """The columns of the sessions: marks, or scores in mode 'group'.
+
+    Out of mode 'group' every column but the reserved ones and '序號' is a
+    session, whatever its dtype: a column with a blank cell is not
+    categorical but is still a session.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
+
+    Returns:
+        list[str]: The column names.
+    """
+    if reserved_col is None:
+        reserved_col = RESERVED_COL
+    if mode == 'group':
+        return [
+            col for col in target.columns
+            if col not in reserved_col and col != '序號'
+            and pd.api.types.is_numeric_dtype(target[col])
+        ]
+    return [col for col in target.columns if col not in reserved_col and col != '序號']
+
+
+def semester_report(
+    target: pd.DataFrame,
+    mode: Literal['attend', 'test', 'hw', "group"],
+    target_path: Optional[str] = None,
+    reserved_col: Optional[list[str]] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Compute the statistics of every student and every session.
+
+    For marks, the count of '1', '假', '0' and blank cells and the rate
+    of '1'; for group scores, the mean and the variance, leaving out '-1' which marks
+    the group being scored. Every session column is reduced to one vector
+    per statistic, and the vectors of a column are kept in
+    '<excel file>.report.pkl' with the digest of the column, so running the
+    report again only recomputes the columns changed since.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the target file.
+        target_path (Optional[str], optional): The path of the target file, for the cache.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the target file.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The statistics by student and by session.
+    """
+    if reserved_col is None:
+        reserved_col = RESERVED_COL
+    cols = session_columns(target, mode, reserved_col)
+    digests = column_digests(target[cols])
+    roster_key = column_digests(target[['學號']].astype(str))['學號']
+
+    cache_path = None if target_path is None else target_path + REPORT_CACHE_SUFFIX
+    cached: dict = {}
+    if cache_path is not None and os.path.isfile(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                stored = pickle.load(f)
+            if stored['roster'] == roster_key and stored['mode'] == mode:
+                cached = stored['columns']
+        except Exception:  # pylint: disable=broad-except
+            cached = {}
+
+    vectors = {}
+    for col in cols:
+        key = digests[col]
+        if col in cached and cached[col][0] == key:
+            vectors[col] = cached[col]
+            continue
+        if mode == 'group':
+            scores = target[col].to_numpy(dtype=float)
+            vectors[col] = (key, np.where(scores == -1, np.nan, scores))
+        else:
+            # marks typed as numbers in Excel are read as 1.0 once the column has a blank
+            marks = target[col].astype(str).str.replace(r'\.0$', '', regex=True).to_numpy()
+            blank = target[col].isna().to_numpy()
+            vectors[col] = (key, np.stack([marks == m for m in MARKS] + [blank]))
+
+    if cache_path is not None:
+        with open(cache_path, 'wb') as f:
+            pickle.dump(
+                {'roster': roster_key, 'mode': mode, 'columns': vectors},
+                f, protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    students = target[list(reserved_col)].copy()
+    if mode == 'group':
+        scores = np.column_stack([vectors[c][1] for c in cols]) if cols else np.empty((len(target), 0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            students['mean'] = np.nanmean(scores, axis=1) if cols else np.nan
+            students['var'] = np.nanvar(scores, axis=1) if cols else np.nan
+            sessions = pd.DataFrame({
+                'mean': np.nanmean(scores, axis=0),
+                'var': np.nanvar(scores, axis=0),
+                'scored': np.sum(~np.isnan(scores), axis=0),
+            }, index=pd.Index(cols, name='session'))
+        return students, sessions
+
+    counts = np.stack([vectors[c][1] for c in cols], axis=2) if cols else \
+        np.zeros((len(MARKS) + 1, len(target), 0), dtype=bool)
+    absent, present, leave, blank = counts.sum(axis=2)
+    students['present'] = present
+    students['leave'] = leave
+    students['missing'] = absent
+    students['blank'] = blank
+    with np.errstate(invalid='ignore', divide='ignore'):
+        students['rate'] = present / len(cols)
+    absent, present, leave, blank = counts.sum(axis=1)
+    sessions = pd.DataFrame({
+        'present': present,
+        'leave': leave,
+        'missing': absent,
+        'blank': blank,
+        'rate': present / max(len(target), 1),
+    }, index=pd.Index(cols, name='session'))
+    return students, sessions
+
+
+def read_copy(
+    target_path: str,
+    mode: Literal['attend', 'test', 'hw', "group"],
+    reserved_col: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """Read a copy of the excel file with its journal, leaving both untouched.
+
+    Args:
+        target_path (str): The path of the copy.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the file.
+        reserved_col (Optional[list[str]], optional): The reserved column name of the file.
+
+    Raises:
+        ValueError: If a reserved column is missing or a 學號 is repeated.
+
+    Returns:
+        pd.DataFrame: Dataframe of the copy.
+    """
+    if reserved_col is None:
+        reserved_col = RESERVED_COL
+    target = read_workbook(target_path, use_cache=False)
+    missing = [col for col in reserved_col if col not in target.columns]
+    if len(missing) > 0:
+        raise ValueError(f"'{target_path}' has no column {missing}.")
+    if mode != 'group':
+        target = compact_marks(target, reserved_col)
+    target = normalize_roster(target)
+    target, _ = replay_journal(target, target_path, mode)
+    repeated = target['學號'][target['學號'].duplicated()]
+    if len(repeated) > 0:
+        raise ValueError(f"'{target_path}' repeats 學號 {repeated.tolist()}.")
+    return target
+
+
+def column_digests(target: pd.DataFrame) -> dict[str, bytes]:
+    """The digest of the values of every column, in the order of the rows.
+
+    Args:
+        target (pd.DataFrame): Dataframe of the target file.
+
+    Returns:
+        dict[str, bytes]: The digest by column name.
+    """
+    return {
+        col: hashlib.blake2b(
+            pd.util.hash_pandas_object(target[col], index=False).to_numpy().tobytes(),
+            digest_size=16).digest()
+        for col in target.columns
+    }
+
+
+def merge_workbooks(
+    base: pd.DataFrame,
+    copies: dict[str, pd.DataFrame],
+    mode: Literal['attend', 'test', 'hw', "group"],
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Three-way merge of copies of a workbook edited apart from each other.
+
+    The rows are aligned on 學號, students added in a copy are appended,
+    and a column new in a copy starts from the default of the mode for
+    the students of the base and empty for the students added. A
+    column of a copy with the same digest as in the base is skipped, and
+    the others are compared with the base cell by cell. A cell changed
+    to the same value in every copy changing it is merged, otherwise it
+    keeps the base value and is listed as a conflict. Columns and
+    students missing from a copy are left as in the base.
+
+    Args:
+        base (pd.DataFrame): The common version the copies started from.
+        copies (dict[str, pd.DataFrame]): The copies by name.
+        mode (Literal['attend', 'test', 'hw', "group"]): The mode of the file.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]:
+            The merged dataframe, and the conflicts with the 學號, 姓名,
+            column, base value and the value of every copy.
+    """
+    ids = pd.Index(base['學號'])
+    for copy in copies.values():
+        ids = ids.append(pd.Index(copy['學號']).difference(ids, sort=False))
+
+    def align(target: pd.DataFrame) -> pd.DataFrame:
+        if np.array_equal(target['學號'].to_numpy(), ids.to_numpy()):
+            return target.reset_index(drop=True)
+        return target.set_index('學號').reindex(ids).reset_index()[target.columns]
+
+    merged = base.copy()
+    for copy in copies.values():
+        for col in copy.columns:
+            if col not in merged.columns:
+                merged = prepare_col(merged, col, mode)
+    merged = align(merged)
+    merged.attrs = dict(base.attrs)
+    digests = column_digests(merged)
+    edits: dict[tuple[int, str], dict[str, object]] = {}
+    for name, copy in copies.items():
+        present = ids.isin(copy['學號'])
+        copy = align(copy)
+        for col, digest in column_digests(copy).items():
+            if col == '學號' or digests[col] == digest:
+                continue
+            old, new = merged[col].astype(object), copy[col].astype(object)
+            changed = present & ~((old == new) | (old.isna() & new.isna())).to_numpy()
+            for row in np.flatnonzero(changed):
+                edits.setdefault((row, col), {})[name] = new.iat[row]
+
+    conflicts = []
+    for (row, col), values in edits.items():
+        if len({plain_value(value) for value in values.values()}) == 1:
+            set_cell(merged, row, col, next(iter(values.values())))
+            continue
+        conflicts.append({
+            '學號': ids[row],
+            '姓名': merged['姓名'].iat[row],
+            'column': col,
+            'base': plain_value(merged[col].iat[row]),
+            **{name: plain_value(value) for name, value in values.items()},
+        })
+    return merged, pd.DataFrame(conflicts, columns=['學號', '姓名', 'column', 'base', *copies])
+
+
+class MyProgramArgs(argparse.Namespace):
+    """args
+    """
+    mode: Optional[Literal['attend', 'test', 'hw', "group"]]
+    title: Optional[str]
+    check: bool
+    flush_every: int
+    from_file: Optional[str]
+    course: Optional[str]
+    assign_groups: Optional[str]
+    profile: Optional[str]
+    no_live: bool
+    import_roster: Optional[str]
+    db: Optional[str]
+    export: bool
+    kiosk: Optional[Literal['terminal', 'web']]
+    port: int
+    merge: Optional[list[str]]
+
+
+if __name__ == '__main__':
+    invoked_cwd = os.getcwd()
+    fileLocations = file_location_find()
+    # if len(fileLocations) == 0:
     #     exit()
 
     parser = argparse.ArgumentParser()
@@ -487,7 +3749,7 @@ if __name__ == '__main__':
     )
     parser.add_argument(
         "-m", "--mode",
-        help="choose mode: 'attend', 'hw', 'group'",
+        help="choose mode: 'attend', 'hw', 'group', or 'report' for the statistics of the course",
         type=str,
         default='',
     )
@@ -497,25 +3759,335 @@ if __name__ == '__main__':
         type=str,
         default='',
     )
+    parser.add_argument(
+        "-f", "--flush-every",
+        help="fold the check-in journal into the excel file every N entries, 0 for only on exit",
+        type=int,
+        default=20,
+    )
+    parser.add_argument(
+        "--from-file",
+        help="read 'id' or 'id,score,...' lines from a file, '-' for stdin, without prompting",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--course",
+        help="choose the course/section in 'ta_support_files.json'",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--assign-groups",
+        help="fill '組別' of every file of the course from a group json file",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--profile",
+        help="time each phase of the entries, print p50/p95/max on exit and dump the samples to a json file",
+        type=str,
+        nargs='?',
+        const='./ta_support_profile.json',
+        default=None,
+    )
+
+    parser.add_argument(
+        "--import-roster",
+        help="make the excel files of every mode and 'ta_support_files.json' from a registrar export",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--db",
+        help="keep the books in a SQLite database instead of the excel files, imported from them the first time",
+        type=str,
+        nargs='?',
+        const='./ta_support.sqlite',
+        default=None,
+    )
+
+    parser.add_argument(
+        "--export",
+        help="write the excel files of the course from the database of '--db'",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--no-live",
+        help="ask for the whole id or name instead of searching as it is typed",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--kiosk",
+        help="let the students check themselves in to the column of '-t' with the session code, "
+             "at this terminal or with 'web' at a form on localhost",
+        type=str,
+        nargs='?',
+        const='terminal',
+        choices=['terminal', 'web'],
+        default=None,
+    )
+
+    parser.add_argument(
+        "--port",
+        help="port of the check-in form of '--kiosk web'",
+        type=int,
+        default=8000,
+    )
+
+    parser.add_argument(
+        "--merge",
+        help="merge copies of the excel file of '-m' edited apart, against the version they started from",
+        type=str,
+        nargs='+',
+        metavar=('BASE', 'COPY'),
+        default=None,
+    )
 
     args: MyProgramArgs = parser.parse_args()
 
+    if args.import_roster is not None:
+        try:
+            imported = import_roster(os.path.join(invoked_cwd, args.import_roster))
+        except FileExistsError as err:
+            print(Fore.RED + Style.BRIGHT + f"| Not imported, {err}" + Style.RESET_ALL)
+            sys.exit(1)
+        for course_name, course_files in imported.items():
+            for mode_name, file_path in course_files.items():
+                print(f"| '{course_name}' '{mode_name}': {file_path}")
+        print(Fore.BLUE + "| Written to 'ta_support_files.json'" + Style.RESET_ALL)
+        sys.exit()
+
+    if args.merge is not None:
+        if args.mode not in ['attend', 'test', 'hw', 'group'] or len(args.merge) < 2:
+            print(
+                Fore.RED + Style.BRIGHT +
+                "| '--merge' requires the mode by '-m', the base file and at least one copy." +
+                Style.RESET_ALL
+            )
+            sys.exit(1)
+        base_path, *copy_paths = [os.path.join(invoked_cwd, p) for p in args.merge]
+        try:
+            merged_book, merge_conflicts = merge_workbooks(
+                base=read_copy(base_path, args.mode),
+                copies={
+                    os.path.basename(p): read_copy(p, args.mode) for p in copy_paths},
+                mode=args.mode,
+            )
+        except ValueError as err:
+            print(Fore.RED + Style.BRIGHT + f"| Not merged, {err}" + Style.RESET_ALL)
+            sys.exit(1)
+        merged_path = os.path.splitext(base_path)[0] + '_merged.xlsx'
+        export_workbook(merged_book, merged_path)
+        print(Fore.BLUE + f"| Merged into '{merged_path}'" + Style.RESET_ALL)
+        if len(merge_conflicts) > 0:
+            conflict_path = os.path.splitext(base_path)[0] + '_conflicts.csv'
+            merge_conflicts.to_csv(conflict_path, index=False)
+            print(merge_conflicts)
+            print(
+                Fore.YELLOW + f"| {len(merge_conflicts)} conflicts written to '{conflict_path}'" +
+                Style.RESET_ALL)
+        sys.exit()
+
+    courses = course_locations(fileLocations)
+
     if args.check:
         print(fileLocations)
+        checked_books = load_workbooks(courses, read_only=True)
+        for (course_name, mode_name), (loaded, _, _) in checked_books.items():
+            print(f"| Loaded '{course_name}' '{mode_name}': {len(loaded)} students")
         sys.exit()
 
-    revised, mode_selected, path = mode_and_target(
-        mode=args.mode,
-        file_locations=fileLocations,
-        reserved_col=RESERVED_COL,
-    )
+    course_selected = args.course
+    if course_selected is None and len(courses) == 1:
+        course_selected = next(iter(courses))
+    while course_selected not in courses:
+        course_selected = input(
+            Fore.BLUE + f"| 輸入課程 {list(courses)}: " + Style.RESET_ALL)
+
+    if args.assign_groups is not None:
+        with open(os.path.join(invoked_cwd, args.assign_groups), encoding='utf-8') as f:
+            group_members = json.load(f)
+        course_books = load_workbooks({course_selected: courses[course_selected]})
+        problems: dict[str, list] = {'unmatched': [], 'duplicated': [], 'ambiguous': []}
+        for (_, mode_name), (loaded, book_path, _) in course_books.items():
+            group_before = {'組別': loaded['組別'].copy()}
+            loaded, problems = assign_groups(loaded, group_members)
+            save_changes(loaded, book_path, changed_cells(loaded, group_before))
+            print(f"| Groups assigned in '{mode_name}': {book_path}")
+        for name in problems['unmatched']:
+            print(Fore.RED + f"| Not in the roster: {name}" + Style.RESET_ALL)
+        for name, in_groups in problems['duplicated']:
+            print(Fore.RED + f"| In several groups: {name} {in_groups}" + Style.RESET_ALL)
+        for name in problems['ambiguous']:
+            print(Fore.YELLOW + f"| Several students named: {name}" + Style.RESET_ALL)
+        sys.exit()
+
+    if args.mode == 'report':
+        course_books = load_workbooks({course_selected: courses[course_selected]})
+        for (_, mode_name), (loaded, book_path, _) in course_books.items():
+            by_student, by_session = semester_report(loaded, mode_name, book_path)
+            report_path = os.path.splitext(book_path)[0] + '_report.xlsx'
+            with pd.ExcelWriter(report_path) as writer:
+                by_student.to_excel(writer, sheet_name='students', index=False)
+                by_session.to_excel(writer, sheet_name='sessions')
+            print(f"| Report of '{mode_name}': {len(by_session)} sessions")
+            print(by_session.describe().loc[['mean', 'min', 'max']])
+            print(Fore.BLUE + f"| Written to '{report_path}'" + Style.RESET_ALL)
+        sys.exit()
+
+    gradebook = GradebookStore(args.db) if args.db is not None else None
+    if args.export:
+        if gradebook is None:
+            print(Fore.RED + Style.BRIGHT + "| '--export' requires '--db'." + Style.RESET_ALL)
+            sys.exit(1)
+        for _, mode_name in gradebook.books(course_selected):
+            gradebook.export(course_selected, mode_name, courses[course_selected][mode_name])
+            print(f"| Exported '{mode_name}': {courses[course_selected][mode_name]}")
+        gradebook.close()
+        sys.exit()
+
+    if args.kiosk is not None and (args.mode not in ['', 'attend'] or len(args.title) == 0):
+        print(
+            Fore.RED + Style.BRIGHT +
+            "| '--kiosk' requires mode 'attend' and the column title by '-t'." + Style.RESET_ALL
+        )
+        sys.exit(1)
 
-    handle_input(
-        target=revised,
-        mode=mode_selected,
-        target_path=path,
+    revised, mode_selected, path, roster_index = mode_and_target(
+        mode=args.mode if args.kiosk is None else 'attend',
+        file_locations=courses[course_selected],
         reserved_col=RESERVED_COL,
+        store=gradebook,
+        course=course_selected,
     )
 
-    revised.to_excel(path, index=False)
-    print(Fore.BLUE + Style.BRIGHT + "| File exported." + Style.RESET_ALL)
+    if args.from_file is not None:
+        if len(args.title) == 0:
+            print(
+                Fore.RED + Style.BRIGHT +
+                "| '--from-file' requires the column title by '-t'." + Style.RESET_ALL
+            )
+            sys.exit(1)
+        if args.from_file == '-':
+            batch_lines = sys.stdin.readlines()
+        else:
+            with open(os.path.join(invoked_cwd, args.from_file), encoding='utf-8') as f:
+                batch_lines = f.readlines()
+        batch_titles = [t.strip() for t in args.title.split(',')]
+        columns_before = {
+            t: revised[t].copy() for t in batch_titles if t in revised.columns}
+        if gradebook is not None:
+            batch_journal = StoreJournal(gradebook, course_selected, mode_selected, revised)
+        revised, rejected_lines = bulk_ingest(
+            target=revised,
+            mode=mode_selected,
+            titles=batch_titles,
+            lines=batch_lines,
+            index=roster_index,
+        )
+        if gradebook is not None:
+            batch_journal.fold(revised)
+            batch_journal.extend(
+                (student_id, col, value)
+                for (student_id, col), value in changed_cells(revised, columns_before).items())
+            gradebook.close()
+        else:
+            save_changes(revised, path, changed_cells(revised, columns_before))
+        print(
+            Fore.BLUE + Style.BRIGHT +
+            f"| {sum(1 for line in batch_lines if line.strip()) - len(rejected_lines)} lines applied, "
+            f"{len(rejected_lines)} rejected." + Style.RESET_ALL
+        )
+        if len(rejected_lines) > 0:
+            reject_path = os.path.splitext(path)[0] + '_rejects.csv'
+            rejected_lines.to_csv(reject_path, index=False)
+            print(Fore.YELLOW + f"| Rejected lines written to '{reject_path}'" + Style.RESET_ALL)
+        sys.exit()
+
+    if gradebook is not None:
+        checkin_journal = StoreJournal(gradebook, course_selected, mode_selected, revised)
+    else:
+        checkin_journal = CheckinJournal(path, flush_every=args.flush_every, background=True)
+
+    if args.kiosk is not None:
+        kiosk_title = args.title.strip()
+        kiosk_rollcall = RollcallSession(
+            revised, mode_selected, path,
+            journal=checkin_journal, index=roster_index, reserved_col=RESERVED_COL)
+        kiosk_rollcall.select_columns([kiosk_title])
+        checkin_kiosk = KioskSession(
+            rollcall=kiosk_rollcall,
+            secret=kiosk_secret(path + KIOSK_KEY_SUFFIX),
+            session_name=f"{course_selected}/{mode_selected}/{kiosk_title}",
+        )
+        print(
+            Fore.YELLOW + Style.BRIGHT +
+            f"| Check-in code of '{kiosk_title}': {checkin_kiosk.code}" + Style.RESET_ALL)
+        checkin_kiosk.start()
+        try:
+            if args.kiosk == 'web':
+                serve_kiosk(checkin_kiosk, args.port)
+            else:
+                run_kiosk(checkin_kiosk)
+        except (KeyboardInterrupt, EOFError):
+            print('\n| exit')
+        finally:
+            checkin_kiosk.close()
+            last_error = checkin_kiosk.take_error()
+            last_error = kiosk_rollcall.close() or last_error
+            if gradebook is not None:
+                gradebook.close()
+        if len(checkin_kiosk.pending) > 0:
+            print(
+                Fore.RED + Style.BRIGHT +
+                f"| {len(checkin_kiosk.pending)} check-ins are not written: {last_error}\n| " +
+                ', '.join(checkin_kiosk.index.ids[row] for row in checkin_kiosk.pending) +
+                Style.RESET_ALL)
+        elif last_error is not None:
+            print(
+                Fore.RED + Style.BRIGHT +
+                f"| Cannot save '{path}': {last_error}\n" +
+                "| The entries are kept in the journal and replayed on the next start." +
+                Style.RESET_ALL)
+        print(Fore.BLUE + Style.BRIGHT + f"| {len(checkin_kiosk.checked)} students checked in." + Style.RESET_ALL)
+        sys.exit()
+    phase_profiler = PhaseProfiler(enabled=args.profile is not None)
+    try:
+        handle_input(
+            target=revised,
+            mode=mode_selected,
+            target_path=path,
+            reserved_col=RESERVED_COL,
+            journal=checkin_journal,
+            index=roster_index,
+            profiler=phase_profiler,
+            live=not args.no_live and sys.stdin.isatty(),
+        )
+    except KeyboardInterrupt:
+        print('\n| exit')
+    finally:
+        with phase_profiler.phase('save'):
+            last_error = checkin_journal.close(revised)
+        if gradebook is not None:
+            gradebook.close()
+        if last_error is not None:
+            print(
+                Fore.RED + Style.BRIGHT +
+                f"| Cannot save '{path}': {last_error}\n" +
+                "| The entries are kept in the journal and replayed on the next start." +
+                Style.RESET_ALL)
+        if args.profile is not None and len(phase_profiler.samples) > 0:
+            print(Fore.BLUE + "| Time per phase (ms):" + Style.RESET_ALL)
+            print(phase_profiler.summary().round(3))
+            phase_profiler.dump(os.path.join(invoked_cwd, args.profile))
+            print(f"| Samples written to '{args.profile}'")
+    if gradebook is not None:
+        print(Fore.BLUE + Style.BRIGHT + f"| Saved in '{args.db}'." + Style.RESET_ALL)
+    else:
+        print(Fore.BLUE + Style.BRIGHT + "| File exported." + Style.RESET_ALL)
@@ -0,0 +1,23 @@
+"""Make the scripts at the root of the repository importable, and share the test roster."""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# registrar-shaped names: Chinese with the romanization, Chinese only, romanization only
+ROSTER = {
+    '序號': [1, 2, 3, 4, 5],
+    '組別': ['第1組', '第1組', '第2組', '第2組', '第2組'],
+    '系級': ['物理二', '物理二', '歷史一', '化學三', '化學三'],
+    '學號': ['110201001', '110201002', '111301003', '109203004', '109203005'],
+    '姓名': ['劉芷妤LIOU,ZHI-YU', '楊依庭YANG,YI-TING', '陳威仁', '王小明WANG,HSIAO-MING', 'SMITH,JOHN'],
+}
+
+
+@pytest.fixture
+def roster() -> pd.DataFrame:
+    """A fresh copy of the test roster, as read from the excel file."""
+    return pd.DataFrame(ROSTER)
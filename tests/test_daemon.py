@@ -0,0 +1,100 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import ta_support_v3 as core
+import ta_support_daemon
+
+
+@pytest.fixture
+def daemon(tmp_path, roster):
+    path = str(tmp_path / 'attend.xlsx')
+    roster['S1'] = '0'
+    roster.to_excel(path, index=False)
+    rollcall = ta_support_daemon.RollcallDaemon({'attend': path}, flush_every=1, save_interval=0)
+    writer = threading.Thread(target=rollcall.writer_loop, daemon=True)
+    writer.start()
+    yield rollcall
+    rollcall.writes.put(None)
+    writer.join(timeout=10)
+    rollcall.close()
+
+
+def request(rollcall, **command) -> dict:
+    slot = {}
+    thread = threading.Thread(target=lambda: slot.update(rollcall.handle(command)), daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), f"{command['cmd']} hung"
+    return slot
+
+
+def test_failed_save_is_reported_and_the_writer_survives(daemon, monkeypatch):
+    def failing_save(*args, **kwargs):
+        raise PermissionError('locked by Excel')
+
+    monkeypatch.setattr(core, 'save_changes', failing_save)
+    response = request(daemon, cmd='assign', mode='attend', id='110201001', values={'S1': '1'})
+    assert response['ok']
+    response = request(daemon, cmd='flush')
+    assert 'locked by Excel' in response['save_errors'][0]
+
+    monkeypatch.undo()
+    response = request(daemon, cmd='assign', mode='attend', id='110201002', values={'S1': '1'})
+    assert response['ok']
+    response = request(daemon, cmd='flush')
+    assert response == {'ok': True}
+    saved = pd.read_excel(daemon.sessions[('default', 'attend')].target_path, dtype=str)
+    assert saved['S1'].tolist() == ['1', '1', '0', '0', '0']
+
+
+def test_assign_does_not_wait_for_the_save(daemon, monkeypatch):
+    release = threading.Event()
+    save_changes = core.save_changes
+
+    def slow_save(*args, **kwargs):
+        release.wait(10)
+        save_changes(*args, **kwargs)
+
+    monkeypatch.setattr(core, 'save_changes', slow_save)
+    for student_id in ['110201001', '110201002', '111301003']:
+        response = request(daemon, cmd='assign', mode='attend', id=student_id, values={'S1': '1'})
+        assert response['ok']
+    release.set()
+    assert request(daemon, cmd='flush') == {'ok': True}
+    saved = pd.read_excel(daemon.sessions[('default', 'attend')].target_path, dtype=str)
+    assert saved['S1'].tolist() == ['1', '1', '1', '0', '0']
+
+
+def test_unexpected_error_is_returned_to_the_client(daemon, monkeypatch):
+    def failing_extend(*args, **kwargs):
+        raise OSError('disk full')
+
+    journal = daemon.sessions[('default', 'attend')].journal
+    monkeypatch.setattr(journal, 'extend', failing_extend)
+    response = request(daemon, cmd='assign', mode='attend', id='110201001', values={'S1': '1'})
+    assert response == {'ok': False, 'error': 'OSError: disk full'}
+    monkeypatch.undo()
+    assert request(daemon, cmd='ping')['ok']
+    assert request(daemon, cmd='assign', mode='attend', id='110201002', values={'S1': '1'})['ok']
+
+
+def test_invalid_mark_is_rejected(daemon):
+    response = request(daemon, cmd='assign', mode='attend', id='110201001', values={'S1': '2'})
+    assert not response['ok']
+    assert "mark '2'" in response['error']
+    assert daemon.sessions[('default', 'attend')].target['S1'].tolist() == ['0'] * 5
+
+
+def test_older_write_is_dropped_as_a_conflict(daemon):
+    newer = request(
+        daemon, cmd='assign', mode='attend', id='110201001', values={'S1': '1'},
+        ts=2.0, client='front')
+    older = request(
+        daemon, cmd='assign', mode='attend', id='110201001', values={'S1': '假'},
+        ts=1.0, client='back')
+    assert newer['conflicts'] == []
+    assert older['conflicts'][0]['kept_by'] == 'front'
+    assert older['students'][0]['S1'] == '1'
+    assert request(daemon, cmd='conflicts')['conflicts'] == older['conflicts']
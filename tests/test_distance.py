@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+import ta_support_v3 as core
+
+
+def random_word(rng: random.Random, length: int) -> str:
+    return ''.join(rng.choice('0123劉芷') for _ in range(length))
+
+
+def typo(rng: random.Random, word: str) -> str:
+    for _ in range(rng.randrange(4)):
+        i = rng.randrange(len(word) + 1)
+        edit = rng.choice(['add', 'drop', 'change', 'swap'])
+        if edit == 'add':
+            word = word[:i] + random_word(rng, 1) + word[i:]
+        elif edit == 'drop':
+            word = word[:i] + word[i + 1:]
+        elif edit == 'change':
+            word = word[:i] + random_word(rng, 1) + word[i + 1:]
+        elif i + 1 < len(word):
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+@pytest.mark.parametrize('max_distance', [None, 0, 1, 3])
+@pytest.mark.parametrize('seed', range(20))
+def test_np_matches_py(seed, max_distance):
+    rng = random.Random(seed)
+    width = rng.randrange(7)
+    candidates = [random_word(rng, width) for _ in range(rng.randrange(1, 30))]
+    queries = [typo(rng, rng.choice(candidates)) for _ in range(5)]
+    queries += ['', random_word(rng, rng.randrange(12))]
+    for query in queries:
+        expected = [core.damerau_levenshtein_distance_py(query, c) for c in candidates]
+        if max_distance is not None:
+            expected = [min(d, max_distance + 1) for d in expected]
+        got = core.damerau_levenshtein_distance_np(query, candidates, max_distance)
+        assert got.tolist() == expected, (query, candidates)
+
+
+def test_np_without_candidates():
+    assert core.damerau_levenshtein_distance_np('110201001', []).tolist() == []
+
+
+def test_np_rejects_unequal_lengths():
+    with pytest.raises(ValueError):
+        core.damerau_levenshtein_distance_np('1102', ['1102', '110'])
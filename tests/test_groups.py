@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+import ta_support_v3 as core
+
+
+@pytest.fixture
+def ungrouped(roster) -> pd.DataFrame:
+    roster['組別'] = ''
+    return core.normalize_roster(roster)
+
+
+def test_assign_groups_matches_registrar_names(ungrouped):
+    target, problems = core.assign_groups(ungrouped, {
+        '第1組': ['劉芷妤', '陳威仁'],
+        '2': ['楊依庭 '],
+    })
+    assert target['組別'].tolist()[:3] == ['1', '2', '1']
+    assert problems == {'unmatched': [], 'duplicated': [], 'ambiguous': []}
+
+
+def test_assign_groups_reports_unmatched_and_ambiguous(ungrouped):
+    ungrouped.loc[4, '姓名'] = '王小明WANG,SIAO-MING'
+    target, problems = core.assign_groups(ungrouped, {
+        1: ['劉芷妤', '王小明'],
+        '第1組': ['林大同'],
+    })
+    assert problems['unmatched'] == ['林大同']
+    assert problems['ambiguous'] == ['王小明']
+    assert problems['duplicated'] == []
+    assert target['組別'].tolist() == ['1', '', '', '', '']
+
+
+def test_assign_groups_reports_duplicated(ungrouped):
+    _, problems = core.assign_groups(ungrouped, {
+        '1': ['劉芷妤'],
+        '第2組': ['劉芷妤LIOU,ZHI-YU'],
+    })
+    assert problems['duplicated'] == [('劉芷妤', ['1', '2'])]
+
+
+def test_parse_group_matrix_takes_the_titles_by_header():
+    scores, rejects = core.parse_group_matrix([
+        '組別\tnote\tg2\tg1',
+        '第1組\tgood\t80\t90',
+        '2,,70,60',
+    ], ['g1', 'g2'])
+    assert scores.to_dict('index') == {'1': {'g1': 90.0, 'g2': 80.0}, '2': {'g1': 60.0, 'g2': 70.0}}
+    assert rejects == []
+
+
+def test_parse_group_matrix_rejects_conflicting_groups():
+    scores, rejects = core.parse_group_matrix([
+        '第1組,90', '1,85', '2,70', '第2組,70', '3,x', '4',
+    ], ['g1'])
+    assert scores.to_dict('index') == {'2': {'g1': 70.0}}
+    assert rejects == [
+        (1, '第1組,90', 'conflicting scores'),
+        (2, '1,85', 'conflicting scores'),
+        (5, '3,x', 'score is not numeric'),
+        (6, '4', 'expect a group and 1 scores'),
+    ]
+
+
+def test_parse_group_matrix_header_without_a_title():
+    scores, rejects = core.parse_group_matrix(['組別,g1', '1,90'], ['g1', 'g2'])
+    assert len(scores) == 0
+    assert rejects == [(1, '組別,g1', "header without ['g2']")]
+
+
+def test_score_groups_writes_every_member(roster):
+    target = core.normalize_roster(roster)
+    target['g1'] = float('nan')
+    scores = pd.DataFrame({'g1': [90.0, 60.0]}, index=['2', '9'])
+    target, entries, empty = core.score_groups(target, ['g1'], scores)
+    assert target['g1'].tolist()[2:] == [90.0, 90.0, 90.0]
+    assert target['g1'].isna().tolist()[:2] == [True, True]
+    assert entries == [(i, 'g1', 90.0) for i in ['111301003', '109203004', '109203005']]
+    assert empty == ['9']
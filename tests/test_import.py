@@ -0,0 +1,55 @@
+import json
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import ta_support_v3 as core
+
+
+def registrar_sheet(sheet, students):
+    sheet.append(['112學年度第1學期 選課名單'])
+    sheet.append(['授課教師', '王老師'])
+    sheet.append([])
+    sheet.append(['序號', '學號', '姓名', '系級', '備註'])
+    for serial, (_, student) in enumerate(students.iterrows(), start=1):
+        sheet.append([serial, student['學號'], f" {student['姓名']} ", student['系級'], None])
+    sheet.append([None, None, f'共 {len(students)} 人'])
+    sheet.append(['列印日期', '2023/09/01'])
+
+
+@pytest.fixture
+def export_path(tmp_path, roster) -> str:
+    path = str(tmp_path / '112_1.xlsx')
+    book = openpyxl.Workbook()
+    registrar_sheet(book.active, roster)
+    book.active.title = 'A'
+    registrar_sheet(book.create_sheet('B 班'), roster.iloc[:2])
+    book.create_sheet('notes').append(['nothing here'])
+    book.save(path)
+    return path
+
+
+def test_registrar_rows_skip_the_header_and_footer(export_path, roster):
+    sheet = openpyxl.load_workbook(export_path, read_only=True).worksheets[0]
+    rows = list(core.registrar_rows(sheet))
+    assert [row[2] for row in rows] == roster['學號'].tolist()
+    assert rows[0] == [1, '物理二', '110201001', '劉芷妤LIOU,ZHI-YU']
+
+
+def test_registrar_rows_without_header(export_path):
+    sheet = openpyxl.load_workbook(export_path, read_only=True).worksheets[2]
+    assert list(core.registrar_rows(sheet)) == []
+
+
+def test_import_roster_makes_a_workbook_per_course(tmp_path, export_path, roster):
+    supported_file = str(tmp_path / 'ta_support_files.json')
+    imported = core.import_roster(export_path, str(tmp_path), ['attend'], supported_file)
+    assert list(imported) == ['A', 'B 班']
+    with open(supported_file, encoding='utf-8') as f:
+        assert json.load(f) == imported
+    target = pd.read_excel(imported['B 班']['attend'], dtype=str)
+    assert target.columns.tolist() == ['序號', '組別', '系級', '學號', '姓名']
+    assert target['學號'].tolist() == roster['學號'].tolist()[:2]
+    with pytest.raises(FileExistsError):
+        core.import_roster(export_path, str(tmp_path), ['attend'], supported_file)
@@ -0,0 +1,44 @@
+import ta_support_v3 as core
+
+
+def test_bulk_ingest_rejects_with_reasons(roster):
+    target = core.normalize_roster(roster)
+    lines = [
+        '110201001',
+        '１１０２０１００２,l',
+        '',
+        '111301003,x',
+        '999999999',
+        '109203004,1,1',
+    ]
+    target, rejected = core.bulk_ingest(target, 'attend', ['S1'], lines)
+    assert target['S1'].tolist() == ['1', '假', '0', '0', '0']
+    assert rejected.to_dict('records') == [
+        {'line': 4, 'input': '111301003,x', 'reason': 'unrecognized mark'},
+        {'line': 5, 'input': '999999999', 'reason': 'id not found'},
+        {'line': 6, 'input': '109203004,1,1', 'reason': 'unrecognized mark'},
+    ]
+
+
+def test_bulk_ingest_conflicting_duplicates(roster):
+    target = core.normalize_roster(roster)
+    lines = ['110201001', '110201001,l', '110201002', '110201002,1']
+    target, rejected = core.bulk_ingest(target, 'attend', ['S1'], lines)
+    assert target['S1'].tolist() == ['0', '1', '0', '0', '0']
+    assert rejected['line'].tolist() == [1, 2]
+    assert set(rejected['reason']) == {'conflicting values'}
+
+
+def test_bulk_ingest_group_scores(roster):
+    target = core.normalize_roster(roster)
+    lines = ['110201001,90,80', '110201002,85', '111301003,x,70']
+    target, rejected = core.bulk_ingest(target, 'group', ['g1', 'g2'], lines)
+    assert target.loc[0, ['g1', 'g2']].tolist() == [90.0, 80.0]
+    assert rejected['reason'].tolist() == ['expect 2 scores', 'score is not numeric']
+
+
+def test_bulk_ingest_rejects_ids_repeated_in_the_roster(roster):
+    roster.loc[4, '學號'] = '109203004'
+    target, rejected = core.bulk_ingest(core.normalize_roster(roster), 'attend', ['S1'], ['109203004'])
+    assert rejected['reason'].tolist() == ['ambiguous id in roster']
+    assert target['S1'].tolist() == ['0'] * 5
@@ -0,0 +1,52 @@
+import os
+import stat
+import time
+
+import pytest
+
+import ta_support_v3 as core
+
+
+def test_kiosk_secret_is_kept_private(tmp_path):
+    key_path = str(tmp_path / 'attend.xlsx') + core.KIOSK_KEY_SUFFIX
+    secret = core.kiosk_secret(key_path)
+    assert len(secret) == 32
+    assert stat.S_IMODE(os.stat(key_path).st_mode) == 0o600
+    assert core.kiosk_secret(key_path) == secret
+
+
+@pytest.fixture
+def kiosk(tmp_path, roster):
+    path = str(tmp_path / 'attend.xlsx')
+    roster['S1'] = '0'
+    roster.to_excel(path, index=False)
+    rollcall = core.RollcallSession.open('attend', {'attend': path}, flush_every=0)
+    rollcall.select_columns(['S1'])
+    kiosk = core.KioskSession(rollcall, b'secret', batch_seconds=0.05)
+    yield kiosk
+    kiosk.close()
+    rollcall.close()
+
+
+def test_failed_batch_is_queued_again(kiosk, monkeypatch):
+    def failing_extend(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(kiosk.rollcall.journal, 'extend', failing_extend)
+    kiosk.start()
+    assert kiosk.check_in('110201001', kiosk.code)[0]
+    assert kiosk.check_in('110201002', kiosk.code)[0]
+    deadline = time.monotonic() + 10
+    error = None
+    while error is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+        error = kiosk.take_error()
+    assert 'disk full' in str(error)
+    assert sorted(kiosk.pending) == [0, 1]
+
+    monkeypatch.undo()
+    assert kiosk.check_in('111301003', kiosk.code)[0]
+    while len(kiosk.pending) > 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert kiosk._thread.is_alive()
+    assert kiosk.rollcall.target['S1'].tolist() == ['1', '1', '1', '0', '0']
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ta_support_v3 as core
+
+
+@pytest.fixture
+def marked(roster) -> pd.DataFrame:
+    roster['S1'] = ['1', '0', '假', '0', '1']
+    return roster
+
+
+def book(frame: pd.DataFrame) -> pd.DataFrame:
+    return core.normalize_roster(core.compact_marks(frame))
+
+
+def test_merge_takes_agreeing_edits_and_lists_conflicts(marked):
+    a, b = marked.copy(), marked.copy()
+    a.loc[1, 'S1'] = '1'
+    b.loc[1, 'S1'] = '1'
+    a.loc[2, 'S1'] = '0'
+    b.loc[2, 'S1'] = '1'
+    merged, conflicts = core.merge_workbooks(book(marked), {'a': book(a), 'b': book(b)}, 'attend')
+    assert merged['S1'].tolist() == ['1', '1', '假', '0', '1']
+    assert conflicts.to_dict('records') == [{
+        '學號': '111301003', '姓名': '陳威仁', 'column': 'S1', 'base': '假', 'a': '0', 'b': '1'}]
+
+
+def test_merge_clears_cells(marked):
+    copy = marked.astype({'S1': object})
+    copy.loc[0, 'S1'] = np.nan
+    merged, conflicts = core.merge_workbooks(book(marked), {'copy': book(copy)}, 'attend')
+    assert pd.isna(merged['S1'].iat[0])
+    assert merged['S1'].tolist()[1:] == ['0', '假', '0', '1']
+    assert len(conflicts) == 0
+
+
+def test_merge_adds_a_student_and_a_column_together(marked):
+    copy = pd.concat([marked, pd.DataFrame([{
+        '序號': 6, '組別': '2', '系級': '歷史一', '學號': '111301006', '姓名': '林大同', 'S1': '1',
+    }])], ignore_index=True)
+    copy['S2'] = ['1', '1', '0', '0', '0', None]
+    other = marked.copy()
+    other['S2'] = ['0', '1', '0', '0', '0']
+    merged, conflicts = core.merge_workbooks(
+        book(marked), {'copy': book(copy), 'other': book(other)}, 'attend')
+    assert merged['學號'].tolist()[-1] == '111301006'
+    assert merged['S1'].tolist() == ['1', '0', '假', '0', '1', '1']
+    assert merged['S2'].tolist()[:5] == ['1', '1', '0', '0', '0']
+    assert pd.isna(merged['S2'].iat[5])
+    assert len(conflicts) == 0
+
+
+def test_read_copy_leaves_no_cache(tmp_path, marked):
+    path = str(tmp_path / 'copy.xlsx')
+    marked.to_excel(path, index=False)
+    copy = core.read_copy(path, 'attend')
+    assert copy['姓名'].tolist()[0] == '劉芷妤LIOU,ZHI-YU'
+    assert os.listdir(tmp_path) == ['copy.xlsx']
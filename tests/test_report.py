@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+import ta_support_v3 as core
+
+
+def test_cache_follows_marks_swapped_between_students(tmp_path, roster):
+    path = str(tmp_path / 'attend.xlsx')
+    roster['S1'] = ['1', '0', '1', '1', '1']
+    target = core.compact_marks(roster)
+    core.semester_report(target, 'attend', path)
+
+    target.loc[[0, 1], 'S1'] = ['0', '1']
+    cached, _ = core.semester_report(target, 'attend', path)
+    fresh, _ = core.semester_report(target, 'attend')
+    assert cached['present'].tolist()[:2] == [0, 1]
+    pd.testing.assert_frame_equal(cached, fresh)
+
+
+def test_columns_with_blank_cells_are_sessions(roster):
+    roster['S1'] = ['1', '假', '0', '1', '1']
+    roster['S2'] = [1.0, np.nan, 0.0, 1.0, np.nan]
+    students, sessions = core.semester_report(core.compact_marks(roster), 'attend')
+    assert sessions.index.tolist() == ['S1', 'S2']
+    assert sessions.loc['S2', ['present', 'missing', 'blank']].tolist() == [2, 1, 2]
+    assert students['blank'].tolist() == [0, 1, 0, 0, 1]
+    assert students['rate'].tolist() == [1.0, 0.0, 0.0, 1.0, 0.5]
+
+
+def test_group_report_leaves_out_the_scored_group(roster):
+    roster['g1'] = [80.0, -1.0, 90.0, 70.0, 60.0]
+    _, sessions = core.semester_report(roster, 'group')
+    assert sessions.loc['g1', ['mean', 'scored']].tolist() == [75.0, 4]
@@ -0,0 +1,71 @@
+import pickle
+
+import pandas as pd
+import pytest
+
+import ta_support_v3 as core
+
+
+@pytest.fixture
+def index(roster):
+    return core.RosterIndex(core.normalize_roster(roster))
+
+
+@pytest.mark.parametrize('query', ['劉芷妤', '妤芷劉', '劉芷好', '芷妤'])
+def test_similar_names_finds_registrar_names(index, query):
+    assert index.similar_names(query)[0][1] == 0
+
+
+def test_similar_names_scores_only_the_chinese_part(index):
+    score, row = index.similar_names('楊依庭')[0]
+    assert (score, row) == (1.0, 1)
+
+
+def test_similar_names_without_chinese(index):
+    assert index.similar_names('SMITH,JOHN')[0][1] == 4
+
+
+def test_lookup_full_width_id(index):
+    assert index.lookup('１１１３０１００３') == ('id', [2])
+
+
+def test_lookup_partial_id_and_name(index):
+    assert index.find_id('1102010') == [0, 1]
+    assert index.find_name('ING') == [1, 3]
+    assert index.find_name('ZHI-YU') == [0]
+
+
+def test_similar_ids_ranks_the_closest_ids(index):
+    assert index.similar_ids('110201009') == [(1, 0), (1, 1), (3, 2)]
+    assert index.similar_ids('1102100１') == [(1, 0), (2, 1)]
+    assert index.similar_ids('11020100', max_distance=1, top_k=1) == [(1, 0)]
+    assert index.similar_ids('') == []
+
+
+def test_index_cache_survives_mark_changes(tmp_path, roster):
+    path = str(tmp_path / 'attend.xlsx')
+    roster.to_excel(path, index=False)
+    target = core.normalize_roster(pd.read_excel(path))
+    first = core.load_roster_index(target, path)
+    target['1/1'] = '1'
+    assert core.load_roster_index(target, path).ids == first.ids
+    assert (tmp_path / 'attend.xlsx.index.pkl').is_file()
+    target.loc[1, '姓名'] = '林大同'
+    assert core.load_roster_index(target, path).names[1] != first.names[1]
+
+
+def test_index_cache_of_another_format_is_rebuilt(tmp_path, roster, monkeypatch):
+    path = str(tmp_path / 'attend.xlsx')
+    target = core.normalize_roster(roster)
+    stale = core.load_roster_index(target, path)
+    stale.ids_by_length = {}
+    cache_path = path + core.INDEX_CACHE_SUFFIX
+    with open(cache_path, 'wb') as f:
+        pickle.dump({'digest': core.roster_digest(target), 'index': stale}, f)
+    assert core.load_roster_index(target, path).similar_ids('110201009')[0] == (1, 0)
+
+    monkeypatch.setattr(core, 'INDEX_FORMAT', core.INDEX_FORMAT + 1)
+    rebuilt = core.load_roster_index(target, path)
+    with open(cache_path, 'rb') as f:
+        assert pickle.load(f)['format'] == core.INDEX_FORMAT
+    assert rebuilt.similar_ids('110201009')[0] == (1, 0)
@@ -0,0 +1,34 @@
+import pytest
+
+import ta_support_v3 as core
+
+
+@pytest.fixture
+def open_session(tmp_path, roster):
+    def opened(mode: str) -> core.RollcallSession:
+        path = str(tmp_path / f'{mode}.xlsx')
+        roster.to_excel(path, index=False)
+        return core.RollcallSession.open(mode, {mode: path}, flush_every=0)
+    return opened
+
+
+@pytest.mark.parametrize('mode', ['attend', 'hw', 'test'])
+@pytest.mark.parametrize('value', ['2', 'x', ''])
+def test_assign_rejects_values_outside_marks(open_session, mode, value):
+    session = open_session(mode)
+    session.select_columns(['S1'])
+    with pytest.raises(ValueError):
+        session.assign('110201001', value)
+    assert session.journal.pending == 0
+    assert session.target['S1'].tolist() == ['0'] * 5
+    session.close()
+
+
+def test_assign_to_other_columns(open_session):
+    session = open_session('group')
+    session.select_columns(['g1', 'g2'])
+    session.assign('110201002', ['90'], columns=['g2'])
+    assert session.target['g2'].tolist()[1] == 90.0
+    with pytest.raises(KeyError):
+        session.assign('110201002', ['90'], columns=['g3'])
+    session.close()
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import time
+
+import openpyxl
+import pandas as pd
+import pytest
+from openpyxl.styles import Font
+
+import ta_support_v3 as core
+
+
+@pytest.fixture
+def sheet_path(tmp_path, roster) -> str:
+    """The roster written to an excel file, with a bold header cell to keep."""
+    path = str(tmp_path / 'attend.xlsx')
+    roster.to_excel(path, index=False)
+    workbook = openpyxl.load_workbook(path)
+    workbook.worksheets[0]['E1'].font = Font(bold=True)
+    workbook.save(path)
+    return path
+
+
+def read_sheet(path: str) -> dict[str, list]:
+    sheet = openpyxl.load_workbook(path).worksheets[0]
+    rows = list(sheet.values)
+    return {name: [row[i] for row in rows[1:]] for i, name in enumerate(rows[0])}
+
+
+def test_replay_patches_the_workbook(sheet_path):
+    path = sheet_path
+    with open(path + '.journal', 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'id': '110201002', 'col': 'S1', 'value': '1', 'ts': 0}) + '\n')
+        f.write('{"id": "1113')
+
+    target, _ = core.load_workbook(path, 'attend')
+    assert target['S1'].tolist() == ['0', '1', '0', '0', '0']
+    assert not os.path.exists(path + '.journal')
+    assert openpyxl.load_workbook(path).worksheets[0]['E1'].font.bold
+    sheet = read_sheet(path)
+    assert sheet['組別'] == ['第1組', '第1組', '第2組', '第2組', '第2組']
+    assert sheet['S1'] == ['0', '1', '0', '0', '0']
+
+
+def test_patch_places_new_columns_by_student_id(sheet_path):
+    path = sheet_path
+    target = core.normalize_roster(pd.read_excel(path)).iloc[::-1].reset_index(drop=True)
+    target['S1'] = ['0', '0', '假', '1', '0']
+    core.patch_workbook(target, path, {})
+    assert read_sheet(path)['S1'] == ['0', '1', '假', '0', '0']
+
+
+def test_store_export_keeps_the_layout(tmp_path, sheet_path):
+    path = sheet_path
+    store = core.GradebookStore(str(tmp_path / 'ta_support.sqlite'))
+    core.load_workbook(path, 'attend', store=store)
+    store.set_values(core.DEFAULT_COURSE, 'attend', [('111301003', 'S1', '1')], new_columns=['S1'])
+    store.export(core.DEFAULT_COURSE, 'attend', path)
+    store.close()
+
+    assert openpyxl.load_workbook(path).worksheets[0]['E1'].font.bold
+    sheet = read_sheet(path)
+    assert sheet['組別'] == ['第1組', '第1組', '第2組', '第2組', '第2組']
+    assert sheet['S1'] == [None, None, '1', None, None]
+
+
+def test_patch_keeps_the_style_of_changed_cells(sheet_path, roster):
+    roster['S1'] = '0'
+    roster.to_excel(sheet_path, index=False)
+    workbook = openpyxl.load_workbook(sheet_path)
+    workbook.worksheets[0]['F3'].font = Font(italic=True)
+    workbook.save(sheet_path)
+
+    target = core.normalize_roster(core.compact_marks(pd.read_excel(sheet_path)))
+    core.set_cell(target, 1, 'S1', '假')
+    core.patch_workbook(target, sheet_path, {('110201002', 'S1'): '假', ('111301003', 'S1'): None})
+    cell = openpyxl.load_workbook(sheet_path).worksheets[0]['F3']
+    assert (cell.value, cell.font.italic) == ('假', True)
+    assert read_sheet(sheet_path)['S1'] == ['0', '假', None, '0', '0']
+    assert pd.read_excel(sheet_path)['姓名'].tolist() == roster['姓名'].tolist()
+
+
+def test_check_leaves_the_files_untouched(sheet_path):
+    path = sheet_path
+    with open(path + '.journal', 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'id': '110201002', 'col': 'S1', 'value': '1', 'ts': 0}) + '\n')
+    before = os.listdir(os.path.dirname(path))
+    mtime = os.path.getmtime(path)
+
+    books = core.load_workbooks({core.DEFAULT_COURSE: {'attend': path}}, read_only=True)
+    target, _, index = books[(core.DEFAULT_COURSE, 'attend')]
+    assert target['S1'].tolist() == ['0', '1', '0', '0', '0']
+    assert index.row_of('110201002') == 1
+    assert sorted(os.listdir(os.path.dirname(path))) == sorted(before)
+    assert os.path.getmtime(path) == mtime
+
+
+def test_background_saver_coalesces_snapshots(tmp_path, monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_save(target, target_path, changes):
+        release.wait(10)
+        calls.append((target, dict(changes)))
+
+    monkeypatch.setattr(core, 'save_changes', slow_save)
+    saver = core.BackgroundSaver(str(tmp_path / 'attend.xlsx'))
+    frames = [pd.DataFrame({'S1': [str(i)]}) for i in range(3)]
+    saver.submit(frames[0], {('110201001', 'S1'): '0'}, [])
+    while len(calls) == 0 and not saver._busy:
+        time.sleep(0.01)
+    saver.submit(frames[1], {('110201001', 'S1'): '1'}, [])
+    saver.submit(frames[2], {('110201002', 'S1'): '2'}, [])
+    release.set()
+    assert saver.close() is None
+    assert len(calls) == 2
+    assert calls[1][0] is frames[2]
+    assert calls[1][1] == {('110201001', 'S1'): '1', ('110201002', 'S1'): '2'}
+
+
+def test_background_saver_keeps_segments_after_a_failed_write(tmp_path, monkeypatch):
+    segment = tmp_path / 'attend.xlsx.journal'
+    segment.write_text('{}\n', encoding='utf-8')
+    calls = []
+
+    def failing_save(target, target_path, changes):
+        calls.append(dict(changes))
+        raise PermissionError('locked by Excel')
+
+    monkeypatch.setattr(core, 'save_changes', failing_save)
+    saver = core.BackgroundSaver(str(tmp_path / 'attend.xlsx'))
+    saver.submit(pd.DataFrame(), {('110201001', 'S1'): '1'}, [str(segment)])
+    assert 'locked by Excel' in str(saver.flush())
+    assert segment.is_file()
+
+    monkeypatch.setattr(core, 'save_changes', lambda *args: calls.append(dict(args[2])))
+    saver.submit(pd.DataFrame(), {('110201002', 'S1'): '1'}, [])
+    assert saver.close() is None
+    assert not segment.is_file()
+    assert calls[-1] == {('110201001', 'S1'): '1', ('110201002', 'S1'): '1'}